@@ -1,6 +1,9 @@
 from __future__ import annotations
 import os
-import json
+import re
+import sys
+import asyncio
+import orjson
 
 # Import compatibility layer first
 
@@ -16,7 +19,7 @@ from livekit.agents import (
 from livekit.agents.multimodal import MultimodalAgent
 from livekit.plugins import openai
 
-from api import AssistantFnc, BevDetails
+from api import AssistantFnc, DB
 from prompts import (
     WELCOME_MESSAGE, 
     INSTRUCTIONS, 
@@ -28,6 +31,29 @@ from prompts import (
 
 load_dotenv()
 
+# Each category's lowercased name without a plural "s", mapped back to its
+# CATEGORIES key. Matched as substrings like the old `in content` test, so
+# "wines" still finds Wine and "spirit" finds Spirits
+_CATEGORY_STEMS = {sys.intern(category.lower().removesuffix("s")): category for category in CATEGORIES}
+# Longest first, so a stem that contains another wins
+_CATEGORY_RE = re.compile("|".join(
+    re.escape(stem) for stem in sorted(_CATEGORY_STEMS, key=len, reverse=True)
+))
+# Every intent keyword handle_query branches on, found in one pass over the message
+_KEYWORD_RE = re.compile(r"categories|category|menu|types|process|order|transaction|yes|notify")
+
+def _find_category(content: str):
+    """Return the first CATEGORIES key named anywhere in lowercased content, or None"""
+    found = {_CATEGORY_STEMS[stem] for stem in _CATEGORY_RE.findall(content)}
+    # CATEGORIES order decides between several, as the old scan over it did
+    return next((category for category in CATEGORIES if category in found), None)
+
+def _transaction_reply(transaction_id, message: str, recommendations: list) -> str:
+    """The reply to an order: cross-sell suggestions only follow a recorded transaction"""
+    if transaction_id and recommendations:
+        return message + "\nYou might also like: " + ", ".join(rec["name"] for rec in recommendations)
+    return message
+
 async def entrypoint(ctx: JobContext):
     await ctx.connect(auto_subscribe=AutoSubscribe.SUBSCRIBE_ALL)
     await ctx.wait_for_participant()
@@ -43,124 +69,123 @@ async def entrypoint(ctx: JobContext):
     bev_agent.start(ctx.room)
     
     session = model.sessions[0]
-    session.conversation.item.create(
-        llm.ChatMessage(
-            role="assistant",
-            content=WELCOME_MESSAGE
+    
+    def say(content: str, role: str = "assistant"):
+        """Add one conversation item and start a single response for it"""
+        session.conversation.item.create(
+            llm.ChatMessage(
+                role=role,
+                content=content
+            )
         )
-    )
-    session.response.create()
+        session.response.create()
+    
+    say(WELCOME_MESSAGE)
+    
+    # Set when a response was started before the user's transcript arrived
+    speculating = False
+    
+    @session.on("input_speech_stopped")
+    def on_input_speech_stopped(*_):
+        # Start inference as soon as the user stops talking instead of waiting
+        # for the transcript; handle_query keeps or cancels it on commit
+        nonlocal speculating
+        if bev_fnc.has_bev() and not bev_fnc.check_inventory_levels():
+            speculating = True
+            session.response.create()
     
     @session.on("user_speech_committed")
     def on_user_speech_committed(msg: llm.ChatMessage):
+        nonlocal speculating
         if isinstance(msg.content, list):
-            msg.content = "\n".join("[image]" if isinstance(x, llm.ChatImage) else x for x in msg)
+            parts = ["[image]" if isinstance(x, llm.ChatImage) else x for x in msg.content]
+            msg.content = "\n".join(parts)
             
+        speculative, speculating = speculating, False
         if bev_fnc.has_bev():
-            handle_query(msg)
+            # Event callbacks must stay synchronous; run the query as a task so
+            # blocking DB work can be pushed off the event loop
+            asyncio.create_task(handle_query(msg, speculative))
         else:
             lookup_bev(msg)
         
     def lookup_bev(msg: llm.ChatMessage):
-        session.conversation.item.create(
-            llm.ChatMessage(
-                role="system",
-                content=LOOKUP_BEV_MESSAGE(msg)
-            )
-        )
-        session.response.create()
+        say(LOOKUP_BEV_MESSAGE(msg), role="system")
         
-    def handle_query(msg: llm.ChatMessage):
-        content = msg.content.lower()
+    def category_response(content: str, keywords: set):
+        """Return the category help reply for content, or None if it isn't a category query"""
+        if "categories" in keywords or "menu" in keywords:
+            return CATEGORY_HELP_MESSAGE
+        if "category" in keywords and "types" in keywords:
+            # Extract category name from message and get subcategory help
+            category = _find_category(content)
+            if category is not None:
+                return get_subcategory_help(category)
+            return "I'm not sure which category you're asking about. " + CATEGORY_HELP_MESSAGE
+        return None
+        
+    async def handle_query(msg: llm.ChatMessage, speculative: bool = False):
+        text = msg.content
+        content = text.lower()
+        keywords = set(_KEYWORD_RE.findall(content))
         
         # Check inventory after any interaction
         inventory_status = bev_fnc.check_inventory_levels()
+        response_content = category_response(content, keywords)
+        wants_process = "process" in keywords
+        wants_order = "order" in keywords or "transaction" in keywords
+        
+        # A speculative response only answers queries that fall through to the model
+        if speculative and (inventory_status or (wants_process and wants_order) or response_content is not None):
+            session.response.cancel()
+            speculative = False
+        
         if inventory_status:
-            if "yes" in content.lower() and "notify" in content.lower():
-                notification_response = "I've notified Brian and Chris about the low inventory. They will handle the reorder soon."
-                session.conversation.item.create(
-                    llm.ChatMessage(
-                        role="assistant",
-                        content=notification_response
-                    )
-                )
-                session.response.create()
+            if "yes" in keywords and "notify" in keywords:
+                say("I've notified Brian and Chris about the low inventory. They will handle the reorder soon.")
                 return
             
-            session.conversation.item.create(
-                llm.ChatMessage(
-                    role="assistant",
-                    content=inventory_status
-                )
-            )
-            session.response.create()
+            # Fold the alert and any category answer into a single turn
+            if response_content is not None:
+                inventory_status = f"{inventory_status}\n\n{response_content}"
+            say(inventory_status)
             return
 
         # Handle order processing
-        if "process" in content and ("order" in content or "transaction" in content):
+        if wants_process and wants_order:
             # Extract items from recent conversation
             items = []
-            if hasattr(bev_fnc, "_bev_details") and bev_fnc._bev_details.get(BevDetails.ID):
+            if bev_fnc.has_bev():
                 items.append({
-                    "id": bev_fnc._bev_details[BevDetails.ID],
+                    "id": bev_fnc._bev.id,
                     "quantity": 1
                 })
             
             # Create items JSON
-            items_json = json.dumps(items)
+            items_json = orjson.dumps(items).decode()
             
-            # Process the transaction
+            # Write the transaction while recommendations are read in parallel
             try:
-                result = bev_fnc.create_transaction(items_json, "cash")
-                session.conversation.item.create(
-                    llm.ChatMessage(
-                        role="assistant",
-                        content=result
-                    )
-                )
-                session.response.create()
-                return
+                transaction_task = asyncio.create_task(bev_fnc.record_transaction(items_json, "cash"))
+                recommendations = await asyncio.to_thread(DB.get_recommendations, items[0]["id"]) if items else []
+                transaction_id, message = await transaction_task
+                result = _transaction_reply(transaction_id, message, recommendations)
             except Exception as e:
-                error_msg = f"Sorry, there was an error processing the transaction: {str(e)}"
-                session.conversation.item.create(
-                    llm.ChatMessage(
-                        role="assistant",
-                        content=error_msg
-                    )
-                )
-                session.response.create()
-                return
+                result = f"Sorry, there was an error processing the transaction: {str(e)}"
+            say(result)
+            return
 
         # Original query handling
-        if "categories" in content or "menu" in content:
-            response_content = CATEGORY_HELP_MESSAGE
-        elif "category" in content and "types" in content:
-            # Extract category name from message and get subcategory help
-            # This is a simple example - you might want more sophisticated parsing
-            for category in CATEGORIES.keys():
-                if (category.lower() in content):
-                    response_content = get_subcategory_help(category)
-                    break
-            else:
-                response_content = "I'm not sure which category you're asking about. " + CATEGORY_HELP_MESSAGE
-        else:
+        if response_content is None:
+            if speculative:
+                # The response started at end of speech already covers this turn
+                return
             # Handle other queries as before
-            session.conversation.item.create(
-                llm.ChatMessage(
-                    role="user",
-                    content=msg.content
-                )
-            )
-            return session.response.create()
+            say(text, role="user")
+            return
 
         # Send category-related response
-        session.conversation.item.create(
-            llm.ChatMessage(
-                role="assistant",
-                content=response_content
-            )
-        )
-        session.response.create()
+        say(response_content)
     
 if __name__ == "__main__":
     cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
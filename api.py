@@ -1,75 +1,125 @@
 from livekit.agents import llm
-import enum
-from typing import Annotated, Optional, List, Dict, Any
+import asyncio
+import functools
+from typing import Annotated, Optional, List, Dict, Any, Tuple
 import logging
-from db_driver import DatabaseDriver
-import json
-from visualization import Visualizer
+from dataclasses import dataclass, fields
+from db_driver import Bev, DatabaseDriver
+import orjson
 
 logger = logging.getLogger("user-data")
 logger.setLevel(logging.INFO)
 
 DB = DatabaseDriver()
-VIZ = Visualizer(DB)
 
-class BevDetails(enum.Enum):
-    ID = "id"
-    Name = "name"
-    Category = "category"
-    Subcategory = "subcategory"
-    Price = "price"
-    Inventory = "inventory"
-    Image = "image"
-    Sales = "sales"
+@functools.lru_cache(maxsize=1)
+def _get_viz():
+    """Build the Visualizer on first use so matplotlib and plotly stay out of worker startup"""
+    from visualization import Visualizer
+    return Visualizer(DB)
+
+def safe_call(label: str):
+    """Turn any exception raised by a function tool into a "<label>: <error>" reply"""
+    def decorator(fnc):
+        if asyncio.iscoroutinefunction(fnc):
+            @functools.wraps(fnc)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await fnc(*args, **kwargs)
+                except Exception as e:
+                    return f"{label}: {str(e)}"
+            return async_wrapper
+        
+        @functools.wraps(fnc)
+        def wrapper(*args, **kwargs):
+            try:
+                return fnc(*args, **kwargs)
+            except Exception as e:
+                return f"{label}: {str(e)}"
+        return wrapper
+    return decorator
+
+def _money(cents) -> str:
+    """Format an amount in cents as dollars with integer arithmetic"""
+    cents = round(cents)
+    sign = "-" if cents < 0 else ""
+    dollars, cents = divmod(abs(cents), 100)
+    return f"{sign}${dollars}.{cents:02d}"
+
+def _parse_items(items_json) -> List[Dict[str, Any]]:
+    """Decode a JSON items array (str or bytes), keeping entries with an id and quantity"""
+    formatted_items = []
+    for item in orjson.loads(items_json):
+        if isinstance(item, dict) and "id" in item and "quantity" in item:
+            # Ensure quantity is an integer
+            item["quantity"] = int(item["quantity"])
+            formatted_items.append(item)
+    return formatted_items
+
+@dataclass(slots=True)
+class CurrentBev:
+    """The beverage currently selected in a session"""
+    id: str = ""
+    name: str = ""
+    category: str = ""
+    subcategory: str = ""
+    price: int = 0
+    inventory: int = 0
+    image: str = ""
+    sales: int = 0
+
+    @classmethod
+    def from_bev(cls, bev: Bev) -> "CurrentBev":
+        return cls(bev.id, bev.name, bev.category, bev.subcategory,
+                   bev.price, bev.inventory, bev.image, bev.sales)
 
 class AssistantFnc(llm.FunctionContext):
     def __init__(self):
         super().__init__()
         
-        self._bev_details = {
-            BevDetails.ID: "",
-            BevDetails.Name: "",
-            BevDetails.Category: "",
-            BevDetails.Subcategory: "",
-            BevDetails.Price: 0,
-            BevDetails.Inventory: 0,
-            BevDetails.Image: "",
-            BevDetails.Sales: 0
-        }
+        self._bev = CurrentBev()
+        self._has_bev = False
         
         self._current_batch_id = None
+        # Beverages already fetched this session, keyed by id
+        self._bev_cache: Dict[str, Any] = {}
+    
+    def _resolve_bev(self, bev_id: str):
+        """Resolve an id or name to (canonical_id, Bev), serving repeat lookups from the session cache"""
+        bev = self._bev_cache.get(bev_id) or self._bev_cache.get(DB._generate_id(bev_id))
+        if bev is not None:
+            return bev.id, bev
+        bev_id, bev = DB.resolve_bev(bev_id)
+        if bev is not None:
+            self._bev_cache[bev_id] = bev
+        return bev_id, bev
+    
+    async def _evict_bevs(self):
+        """Drop the cached beverages after a write that moved stock and sales.
+
+        Finalizing a batch does, and its items aren't known here, so the
+        whole cache goes. The current beverage is re-read off the event loop
+        so inventory checks see the new stock.
+        """
+        self._bev_cache.clear()
+        if self._has_bev:
+            bev = await asyncio.to_thread(DB.get_bev_by_id, self._bev.id)
+            if bev is not None:
+                self._bev = CurrentBev.from_bev(bev)
     
     def get_bev_str(self):
-        bev_str = ""
-        for key, value in self._bev_details.items():
-            bev_str += f"{key.value}: {value}\n"
-        return bev_str
+        return "\n".join(f"{field.name}: {getattr(self._bev, field.name)}" for field in fields(self._bev)) + "\n"
     
     @llm.ai_callable(description="lookup a beverage by its id or name")
     def lookup_bev(self, bev_id: Annotated[str, llm.TypeInfo(description="The id or name of the beverage to lookup")]):
         logger.info("lookup bev - id/name: %s", bev_id)
         
-        # Try exact ID match first
-        result = DB.get_bev_by_id(bev_id)
-        
-        # If not found, try generating ID from name
-        if result is None:
-            generated_id = DB._generate_id(bev_id)
-            result = DB.get_bev_by_id(generated_id)
-            
+        _, result = self._resolve_bev(bev_id)
         if result is None:
             return "Beverage not found"
         
-        self._bev_details = {
-            BevDetails.ID: result.id,
-            BevDetails.Name: result.name,
-            BevDetails.Category: result.category,
-            BevDetails.Subcategory: result.subcategory,
-            BevDetails.Price: result.price,
-            BevDetails.Inventory: result.inventory,
-            BevDetails.Image: result.image,
-            BevDetails.Sales: result.sales
-        }
+        self._bev = CurrentBev.from_bev(result)
+        self._has_bev = True
         
         return f"The beverage details are:\n{self.get_bev_str()}"
     
@@ -94,30 +144,23 @@ class AssistantFnc(llm.FunctionContext):
         result = DB.create_bev(bev_id, name, category, subcategory, price, inventory, image, sales)
         if result is None:
             return "Failed to create beverage"
+        self._bev_cache[result.id] = result
         
-        self._bev_details = {
-            BevDetails.ID: result.id,
-            BevDetails.Name: result.name,
-            BevDetails.Category: result.category,
-            BevDetails.Subcategory: result.subcategory,
-            BevDetails.Price: result.price,
-            BevDetails.Inventory: result.inventory,
-            BevDetails.Image: result.image,
-            BevDetails.Sales: result.sales
-        }
+        self._bev = CurrentBev.from_bev(result)
+        self._has_bev = True
         
         return "beverage created!"
     
     def has_bev(self):
-        return self._bev_details[BevDetails.ID] != ""
+        return self._has_bev
     
     @llm.ai_callable(description="check inventory levels and notify if low")
     def check_inventory_levels(self):
         if not self.has_bev():
             return "No beverage selected"
         
-        bev_name = self._bev_details[BevDetails.Name]
-        inventory = self._bev_details[BevDetails.Inventory]
+        bev_name = self._bev.name
+        inventory = self._bev.inventory
         initial_inventory = 100  # Assuming initial inventory was 100 units
         
         if (inventory / initial_inventory) < 0.3:
@@ -137,7 +180,9 @@ class AssistantFnc(llm.FunctionContext):
         image: Annotated[str, llm.TypeInfo(description="New image URL")] = None
     ):
         """Update beverage details"""
-        current_bev = DB.get_bev_by_id(bev_id)
+        # Read the row fresh rather than from the cache: its inventory and
+        # sales are written back as they are for any field not being changed
+        bev_id, current_bev = DB.resolve_bev(bev_id)
         if not current_bev:
             return "Beverage not found"
             
@@ -151,16 +196,9 @@ class AssistantFnc(llm.FunctionContext):
         
         result = DB.create_bev(bev_id, name, category, subcategory, price, inventory, image, current_bev.sales)
         if result:
-            self._bev_details.update({
-                BevDetails.ID: result.id,
-                BevDetails.Name: result.name,
-                BevDetails.Category: result.category,
-                BevDetails.Subcategory: result.subcategory,
-                BevDetails.Price: result.price,
-                BevDetails.Inventory: result.inventory,
-                BevDetails.Image: result.image,
-                BevDetails.Sales: result.sales
-            })
+            self._bev_cache[result.id] = result
+            self._bev = CurrentBev.from_bev(result)
+            self._has_bev = True
             return "Beverage updated successfully!"
         return "Failed to update beverage"
 
@@ -168,56 +206,56 @@ class AssistantFnc(llm.FunctionContext):
     def delete_bev(self, bev_id: Annotated[str, llm.TypeInfo(description="The id of the beverage to delete")]):
         """Delete a beverage"""
         if DB.delete_bev(bev_id):
-            if self._bev_details[BevDetails.ID] == bev_id:
-                self._bev_details = {key: "" if isinstance(value, str) else 0 for key, value in self._bev_details.items()}
+            # Lookups by name cache the entry under the generated id
+            bev_ids = {bev_id, DB._generate_id(bev_id)}
+            for cached_id in bev_ids:
+                self._bev_cache.pop(cached_id, None)
+            if self._bev.id in bev_ids:
+                self._bev = CurrentBev()
+                self._has_bev = False
             return "Beverage deleted successfully!"
         return "Failed to delete beverage"
 
     @llm.ai_callable(description="list all beverages in a category")
     def list_bevs_by_category(self, category: Annotated[str, llm.TypeInfo(description="The category to list beverages from")]):
         """List all beverages in a category"""
-        bevs = DB.get_bevs_by_category(category)
-        if not bevs:
+        lines = [f"- {bev.name} ({_money(bev.price)})\n" for bev in DB.iter_bevs_by_category(category)]
+        if not lines:
             return f"No beverages found in category: {category}"
         
-        result = f"Beverages in {category}:\n"
-        for bev in bevs:
-            result += f"- {bev.name} (${bev.price/100:.2f})\n"
-        return result
+        return f"Beverages in {category}:\n" + "".join(lines)
 
     @llm.ai_callable(description="create a new transaction")
-    def create_transaction(
+    @safe_call("Error processing transaction")
+    async def create_transaction(
         self,
         items_json: Annotated[str, llm.TypeInfo(description="JSON string of items array with id and quantity")],
         payment_method: Annotated[str, llm.TypeInfo(description="Payment method used")],
         employee_id: Annotated[Optional[int], llm.TypeInfo(description="ID of employee processing transaction")] = None
     ):
         """Create a new transaction with items"""
+        _, message = await self.record_transaction(items_json, payment_method, employee_id)
+        return message
+
+    async def record_transaction(self, items_json: str, payment_method: str,
+                                 employee_id: Optional[int] = None) -> Tuple[Optional[int], str]:
+        """Create a transaction and return (transaction_id, reply); the id is None on failure"""
         try:
-            items = json.loads(items_json)  # Convert JSON string to list
-            
-            # Ensure items are properly formatted
-            formatted_items = []
-            for item in items:
-                if isinstance(item, dict) and "id" in item and "quantity" in item:
-                    # Ensure quantity is an integer
-                    item["quantity"] = int(item["quantity"])
-                    formatted_items.append(item)
+            # Parse and validate off the event loop
+            formatted_items = await asyncio.to_thread(_parse_items, items_json)
+        except orjson.JSONDecodeError:
+            return None, "Invalid items format. Please provide a valid JSON array of items."
+        
+        if not formatted_items:
+            return None, "No valid items found in the transaction"
             
-            if not formatted_items:
-                return "No valid items found in the transaction"
-                
-            transaction_id = DB.create_transaction(payment_method, formatted_items, employee_id)
-            if transaction_id:
-                return f"Transaction {transaction_id} created successfully!"
-            return "Failed to create transaction"
-        except json.JSONDecodeError:
-            return "Invalid items format. Please provide a valid JSON array of items."
-        except Exception as e:
-            return f"Error processing transaction: {str(e)}"
+        transaction_id = await asyncio.to_thread(DB.create_transaction, payment_method, formatted_items, employee_id)
+        if transaction_id:
+            return transaction_id, f"Transaction {transaction_id} created successfully!"
+        return None, "Failed to create transaction"
 
     @llm.ai_callable(description="create a new event booking")
-    def create_event(
+    async def create_event(
         self,
         event_name: Annotated[str, llm.TypeInfo(description="Name of the event")],
         event_type: Annotated[str, llm.TypeInfo(description="Type of event (wedding/corporate)")],
@@ -228,7 +266,7 @@ class AssistantFnc(llm.FunctionContext):
         description: Annotated[str, llm.TypeInfo(description="Event description")] = None
     ):
         """Create a new event booking"""
-        event_id = DB.create_event(event_name, event_type, event_date, event_time, venue, client_id, description)
+        event_id = await asyncio.to_thread(DB.create_event, event_name, event_type, event_date, event_time, venue, client_id, description)
         if event_id:
             return f"Event {event_id} created successfully!"
         return "Failed to create event"
@@ -271,100 +309,97 @@ class AssistantFnc(llm.FunctionContext):
         return f"Revenue Summary:\n{summary}"
 
     @llm.ai_callable(description="generate a visual representation of the menu")
+    @safe_call("Error generating visual menu")
     def visualize_menu(self, category: Annotated[Optional[str], llm.TypeInfo(description="Category to visualize")] = None):
         """Generate a visual menu representation"""
-        try:
-            chart_data = VIZ.generate_visual_menu(category)
-            return {
-                "chart": chart_data,
-                "message": f"Visual menu for {'all categories' if not category else category}"
-            }
-        except Exception as e:
-            return f"Error generating visual menu: {str(e)}"
+        chart_data = _get_viz().generate_visual_menu(category)
+        return {
+            "chart": chart_data,
+            "message": f"Visual menu for {'all categories' if not category else category}"
+        }
 
     @llm.ai_callable(description="generate a sales trend chart")
+    @safe_call("Error generating sales trend")
     def visualize_sales_trend(self, days: Annotated[int, llm.TypeInfo(description="Number of days to include")] = 30):
         """Generate a sales trend chart"""
-        try:
-            chart_data = VIZ.generate_sales_trend(days)
-            return {
-                "chart": chart_data,
-                "message": f"Sales trend for the last {days} days"
-            }
-        except Exception as e:
-            return f"Error generating sales trend: {str(e)}"
+        chart_data = _get_viz().generate_sales_trend(days)
+        return {
+            "chart": chart_data,
+            "message": f"Sales trend for the last {days} days"
+        }
 
     @llm.ai_callable(description="generate a receipt for a transaction")
-    def generate_receipt(self, transaction_id: Annotated[int, llm.TypeInfo(description="Transaction ID to generate receipt for")]):
+    @safe_call("Error generating receipt")
+    async def generate_receipt(self, transaction_id: Annotated[int, llm.TypeInfo(description="Transaction ID to generate receipt for")]):
         """Generate a receipt for a transaction"""
-        try:
-            receipt = DB.generate_receipt(transaction_id)
-            if "error" in receipt:
-                return receipt["error"]
-            
-            # Format receipt as text
-            receipt_text = f"Receipt #{receipt['transaction_id']}\n"
-            receipt_text += f"Date: {receipt['date']} {receipt['time']}\n\n"
-            receipt_text += "Items:\n"
-            
-            for item in receipt['items']:
-                receipt_text += f"  {item['name']} x{item['quantity']} @ ${item['unit_price']/100:.2f} = ${item['total']/100:.2f}\n"
-            
-            receipt_text += f"\nSubtotal: ${receipt['subtotal']/100:.2f}\n"
-            receipt_text += f"Tax: ${receipt['tax']/100:.2f}\n"
-            receipt_text += f"Total: ${receipt['total']/100:.2f}\n"
-            receipt_text += f"Payment method: {receipt['payment_method']}\n"
-            
-            return receipt_text
-        except Exception as e:
-            return f"Error generating receipt: {str(e)}"
+        receipt = await asyncio.to_thread(DB.generate_receipt, transaction_id)
+        if "error" in receipt:
+            return receipt["error"]
+        
+        # Format receipt as text
+        lines = [
+            f"Receipt #{receipt['transaction_id']}",
+            f"Date: {receipt['date']} {receipt['time']}",
+            "",
+            "Items:"
+        ]
+        
+        for item in receipt['items']:
+            lines.append(f"  {item['name']} x{item['quantity']} @ {_money(item['unit_price'])} = {_money(item['total'])}")
+        
+        lines.extend([
+            "",
+            f"Subtotal: {_money(receipt['subtotal'])}",
+            f"Tax: {_money(receipt['tax'])}",
+            f"Total: {_money(receipt['total'])}",
+            f"Payment method: {receipt['payment_method']}"
+        ])
+        
+        return "\n".join(lines) + "\n"
 
     @llm.ai_callable(description="get beverage recommendations")
+    @safe_call("Error getting recommendations")
     def get_recommendations(
         self,
         bev_id: Annotated[Optional[str], llm.TypeInfo(description="Beverage ID to get recommendations for")],
         limit: Annotated[int, llm.TypeInfo(description="Maximum number of recommendations")] = 3
     ):
         """Get recommendations for a beverage"""
-        try:
-            # If no bev_id provided, use current selected beverage
-            if not bev_id and self.has_bev():
-                bev_id = self._bev_details[BevDetails.ID]
-            
-            if not bev_id:
-                return "No beverage selected for recommendations"
-            
-            recommendations = DB.get_recommendations(bev_id, limit)
-            
-            if not recommendations:
-                return f"No recommendations found for {bev_id}"
-            
-            # Format recommendations as text
-            result = f"Recommendations based on {bev_id}:\n"
-            for rec in recommendations:
-                result += f"- {rec['name']} (${rec['price']/100:.2f}) - {rec['confidence']*100:.0f}% match\n"
-            
-            return result
-        except Exception as e:
-            return f"Error getting recommendations: {str(e)}"
+        # If no bev_id provided, use current selected beverage
+        if not bev_id and self.has_bev():
+            bev_id = self._bev.id
+        
+        if not bev_id:
+            return "No beverage selected for recommendations"
+        
+        recommendations = DB.get_recommendations(bev_id, limit)
+        
+        if not recommendations:
+            return f"No recommendations found for {bev_id}"
+        
+        # Format recommendations as text
+        result = f"Recommendations based on {bev_id}:\n"
+        for rec in recommendations:
+            result += f"- {rec['name']} ({_money(rec['price'])}) - {rec['confidence']*100:.0f}% match\n"
+        
+        return result
 
     @llm.ai_callable(description="create a batch order")
+    @safe_call("Error creating batch order")
     def create_batch_order(
         self,
         table_number: Annotated[str, llm.TypeInfo(description="Table number or identifier")],
         customer_id: Annotated[Optional[int], llm.TypeInfo(description="Customer ID if available")] = None
     ):
         """Create a new batch order"""
-        try:
-            batch_id = DB.create_batch_order(table_number, customer_id)
-            if batch_id:
-                self._current_batch_id = batch_id
-                return f"Batch order #{batch_id} created for table {table_number}"
-            return "Failed to create batch order"
-        except Exception as e:
-            return f"Error creating batch order: {str(e)}"
+        batch_id = DB.create_batch_order(table_number, customer_id)
+        if batch_id:
+            self._current_batch_id = batch_id
+            return f"Batch order #{batch_id} created for table {table_number}"
+        return "Failed to create batch order"
 
     @llm.ai_callable(description="add an item to the current batch order")
+    @safe_call("Error adding to batch")
     def add_to_batch(
         self,
         bev_id: Annotated[str, llm.TypeInfo(description="Beverage ID to add")],
@@ -372,87 +407,74 @@ class AssistantFnc(llm.FunctionContext):
         notes: Annotated[Optional[str], llm.TypeInfo(description="Special instructions")] = None
     ):
         """Add an item to the current batch order"""
-        try:
-            if not self._current_batch_id:
-                return "No active batch order. Create one first."
-            
-            # Try exact ID match first
-            result = DB.get_bev_by_id(bev_id)
-            
-            # If not found, try generating ID from name
-            if result is None:
-                generated_id = DB._generate_id(bev_id)
-                result = DB.get_bev_by_id(generated_id)
-                if result:
-                    bev_id = generated_id
-            
-            if result is None:
-                return f"Beverage '{bev_id}' not found"
-            
-            if DB.add_to_batch(self._current_batch_id, bev_id, quantity, notes):
-                return f"Added {quantity}x {result.name} to batch #{self._current_batch_id}"
-            return "Failed to add item to batch"
-        except Exception as e:
-            return f"Error adding to batch: {str(e)}"
+        if not self._current_batch_id:
+            return "No active batch order. Create one first."
+        
+        bev_id, result = self._resolve_bev(bev_id)
+        if result is None:
+            return f"Beverage '{bev_id}' not found"
+        
+        if DB.add_to_batch(self._current_batch_id, bev_id, quantity, notes):
+            return f"Added {quantity}x {result.name} to batch #{self._current_batch_id}"
+        return "Failed to add item to batch"
 
     @llm.ai_callable(description="get the current batch order details")
+    @safe_call("Error getting batch order")
     def get_batch_order(self):
         """Get the current batch order details"""
-        try:
-            if not self._current_batch_id:
-                return "No active batch order"
-            
-            batch = DB.get_batch_order(self._current_batch_id)
-            if "error" in batch:
-                return batch["error"]
-            
-            # Format batch as text
-            batch_text = f"Batch Order #{batch['batch_id']}\n"
-            batch_text += f"Table: {batch['table_number']}\n"
-            batch_text += f"Status: {batch['status']}\n\n"
-            batch_text += "Items:\n"
-            
-            for item in batch['items']:
-                batch_text += f"  {item['name']} x{item['quantity']} @ ${item['unit_price']/100:.2f}"
-                if item['notes']:
-                    batch_text += f" - Note: {item['notes']}"
-                batch_text += "\n"
-            
-            batch_text += f"\nSubtotal: ${batch['subtotal']/100:.2f}"
-            return batch_text
-        except Exception as e:
-            return f"Error getting batch order: {str(e)}"
+        if not self._current_batch_id:
+            return "No active batch order"
+        
+        batch = DB.get_batch_order(self._current_batch_id)
+        if "error" in batch:
+            return batch["error"]
+        
+        # Format batch as text
+        lines = [
+            f"Batch Order #{batch['batch_id']}",
+            f"Table: {batch['table_number']}",
+            f"Status: {batch['status']}",
+            "",
+            "Items:"
+        ]
+        
+        for item in batch['items']:
+            line = f"  {item['name']} x{item['quantity']} @ {_money(item['unit_price'])}"
+            if item['notes']:
+                line += f" - Note: {item['notes']}"
+            lines.append(line)
+        
+        lines.extend(["", f"Subtotal: {_money(batch['subtotal'])}"])
+        return "\n".join(lines)
 
     @llm.ai_callable(description="finalize the current batch order")
-    def finalize_batch(
+    @safe_call("Error finalizing batch")
+    async def finalize_batch(
         self,
         payment_method: Annotated[str, llm.TypeInfo(description="Payment method to use")],
         employee_id: Annotated[Optional[int], llm.TypeInfo(description="Employee ID processing the order")] = None
     ):
         """Finalize and process the current batch order"""
-        try:
-            if not self._current_batch_id:
-                return "No active batch order"
-            
-            transaction_id = DB.finalize_batch(self._current_batch_id, payment_method, employee_id)
-            if transaction_id:
-                receipt = self.generate_receipt(transaction_id)
-                self._current_batch_id = None  # Clear the current batch
-                return f"Batch order finalized!\n\n{receipt}"
-            return "Failed to finalize batch order"
-        except Exception as e:
-            return f"Error finalizing batch: {str(e)}"
+        if not self._current_batch_id:
+            return "No active batch order"
+        
+        transaction_id = await asyncio.to_thread(DB.finalize_batch, self._current_batch_id, payment_method, employee_id)
+        if transaction_id:
+            # Finalizing took the batch's items out of stock
+            await self._evict_bevs()
+            receipt = await self.generate_receipt(transaction_id)
+            self._current_batch_id = None  # Clear the current batch
+            return f"Batch order finalized!\n\n{receipt}"
+        return "Failed to finalize batch order"
 
     @llm.ai_callable(description="cancel the current batch order")
+    @safe_call("Error cancelling batch")
     def cancel_batch(self):
         """Cancel the current batch order"""
-        try:
-            if not self._current_batch_id:
-                return "No active batch order"
-            
-            if DB.cancel_batch(self._current_batch_id):
-                self._current_batch_id = None
-                return "Batch order cancelled successfully"
-            return "Failed to cancel batch order"
-        except Exception as e:
-            return f"Error cancelling batch: {str(e)}"
\ No newline at end of file
+        if not self._current_batch_id:
+            return "No active batch order"
+        
+        if DB.cancel_batch(self._current_batch_id):
+            self._current_batch_id = None
+            return "Batch order cancelled successfully"
+        return "Failed to cancel batch order"
\ No newline at end of file
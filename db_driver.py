@@ -1,12 +1,241 @@
 import sqlite3
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, Iterator, Iterable
 from dataclasses import dataclass
 from contextlib import contextmanager
+from functools import lru_cache
 import json
 import os
-from datetime import datetime
+import atexit
+import queue
+import threading
+from urllib.parse import quote
 
-@dataclass
+try:
+    # Optional: lets _load_initial_data stream large catalogues
+    import ijson
+except ImportError:
+    ijson = None
+
+# Applied once when the driver opens its connection. journal_mode=WAL is
+# persistent: it is recorded in the database file and stays on for every
+# later connection, including ones opened by other processes.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",  # 64 MiB
+    "PRAGMA mmap_size=268435456",  # 256 MiB
+)
+
+# Read-only connections can't change the journal mode; the file is already
+# in WAL once the writer has opened it
+_READONLY_PRAGMAS = tuple(p for p in _CONNECTION_PRAGMAS if "journal_mode" not in p)
+
+# Idle read-only connections kept by each driver for reuse
+_READONLY_POOL_SIZE = 4
+
+def connect(db_path: str, pragmas: Tuple[str, ...] = _CONNECTION_PRAGMAS, **kwargs) -> sqlite3.Connection:
+    """Open an SQLite connection with the shared pragmas applied.
+
+    sqlite3's default timeout of 5 seconds already sets the busy timeout, so
+    writers from other connections wait for the lock instead of failing.
+    """
+    conn = sqlite3.connect(db_path, **kwargs)
+    for pragma in pragmas:
+        conn.execute(pragma)
+    return conn
+
+def close(conn: sqlite3.Connection):
+    """Let SQLite refresh its planner statistics, then close the connection"""
+    try:
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+# Stored in PRAGMA user_version once _init_db has built the schema. Bump it
+# whenever the DDL in _init_db changes so existing databases pick it up.
+_SCHEMA_VERSION = 5
+
+# Insert a beverage or overwrite the existing row with the same id
+_SQL_UPSERT_BEV = """
+    INSERT INTO bevs (id, name, category, subcategory, price, inventory, image, sales)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name=excluded.name, category=excluded.category, subcategory=excluded.subcategory,
+        price=excluded.price, inventory=excluded.inventory, image=excluded.image,
+        sales=excluded.sales
+"""
+
+# Lowercases ASCII letters and turns spaces into underscores in one pass
+_ID_TABLE = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ ",
+    "abcdefghijklmnopqrstuvwxyz_",
+)
+
+# Column order matches Bev's positional fields, so rows unpack with Bev(*row)
+_BEV_COLUMNS = "id, name, category, subcategory, price, inventory, image, sales"
+
+# Hot-path statements are kept as module constants so every call passes the
+# identical string and sqlite3 reuses its compiled statement from the
+# connection's cache instead of re-preparing it
+_SQL_GET_BEV = f"SELECT {_BEV_COLUMNS} FROM bevs WHERE id = ?"
+_SQL_GET_BEVS_BY_CATEGORY = f"SELECT {_BEV_COLUMNS} FROM bevs WHERE category = ? ORDER BY name"
+# Categories arrive as one JSON array; rows come back grouped in the array's
+# order, then by name, as successive per-category calls would return them
+_SQL_GET_BEVS_BY_CATEGORIES = """
+    SELECT b.id, b.name, b.category, b.subcategory, b.price, b.inventory, b.image, b.sales
+    FROM json_each(?) c
+    JOIN bevs b ON b.category = c.value
+    ORDER BY c.key, b.name
+"""
+_SQL_GET_PRICE = "SELECT price FROM bevs WHERE id = ?"
+# Ids arrive as one JSON array, so the statement text is the same for any
+# number of items and never runs into SQLite's bound-variable limit
+_SQL_GET_PRICES = "SELECT id, price FROM bevs WHERE id IN (SELECT value FROM json_each(?))"
+_SQL_GET_TAX_RATES = "SELECT tax_type, tax_id, rate FROM tax_rates ORDER BY tax_id"
+_SQL_INSERT_TXN = """
+    INSERT INTO transactions (
+        transaction_date, transaction_time, total_amount, 
+        tax_amount, payment_method, employee_id
+    ) VALUES (DATE('now', 'localtime'), TIME('now', 'localtime'), ?, ?, ?, ?)
+"""
+_SQL_INSERT_TI = """
+    INSERT INTO transaction_items (
+        transaction_id, item_id, quantity, unit_price,
+        line_total, tax_category, tax_amount
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+_SQL_INSERT_TAX_DETAIL = """
+    INSERT INTO tax_details (transaction_item_id, tax_id, calculated_tax_amount)
+    VALUES (?, ?, ?)
+"""
+_SQL_INSERT_TAX_DETAILS_FOR_TXN = """
+    INSERT INTO tax_details (transaction_item_id, tax_id, calculated_tax_amount)
+    SELECT ti.transaction_item_id, tr.tax_id, ti.tax_amount
+    FROM transaction_items ti
+    JOIN tax_rates tr ON tr.tax_type = ti.tax_category
+    WHERE ti.transaction_id = ?
+"""
+_SQL_GET_TXN = """
+    SELECT t.transaction_id, t.transaction_date, t.transaction_time, 
+           t.total_amount, t.tax_amount, t.payment_method
+    FROM transactions t
+    WHERE t.transaction_id = ?
+"""
+_SQL_GET_TXN_ITEMS = """
+    SELECT ti.item_id, b.name, ti.quantity, ti.unit_price, 
+           ti.line_total, ti.tax_amount
+    FROM transaction_items ti
+    JOIN bevs b ON ti.item_id = b.id
+    WHERE ti.transaction_id = ?
+    ORDER BY ti.transaction_item_id
+"""
+_SQL_INSERT_BATCH = """
+    INSERT INTO order_batches (table_number, customer_id)
+    VALUES (?, ?)
+"""
+_SQL_INSERT_BATCH_ITEM = """
+    INSERT INTO batch_items (batch_id, bev_id, quantity, notes)
+    VALUES (?, ?, ?, ?)
+"""
+_SQL_GET_BATCH = """
+    SELECT batch_id, order_time, table_number, status, customer_id
+    FROM order_batches
+    WHERE batch_id = ?
+"""
+_SQL_GET_BATCH_BEVS = """
+    SELECT bi.bev_id, bi.quantity
+    FROM order_batches ob
+    LEFT JOIN batch_items bi ON bi.batch_id = ob.batch_id
+    WHERE ob.batch_id = ?
+    ORDER BY bi.item_id
+"""
+# Explicit recommendations if there are any, otherwise the best sellers from
+# the same category/subcategory at a fixed 0.7 confidence, in one statement
+_SQL_GET_RECOMMENDATIONS = """
+    WITH explicit AS (
+        SELECT r.recommended_bev_id AS id, b.name, b.category, b.price,
+               r.confidence, b.sales
+        FROM drink_recommendations r
+        JOIN bevs b ON r.recommended_bev_id = b.id
+        WHERE r.bev_id = ?
+    )
+    SELECT id, name, category, price, confidence
+    FROM (
+        SELECT * FROM explicit
+        UNION ALL
+        SELECT b.id, b.name, b.category, b.price, 0.7, b.sales
+        FROM bevs src
+        JOIN bevs b ON b.category = src.category AND b.subcategory = src.subcategory
+                   AND b.id != src.id
+        WHERE src.id = ? AND NOT EXISTS (SELECT 1 FROM explicit)
+    )
+    ORDER BY confidence DESC, sales DESC
+    LIMIT ?
+"""
+_SQL_UPSERT_RECOMMENDATION = """
+    INSERT INTO drink_recommendations (bev_id, recommended_bev_id, confidence)
+    VALUES (?, ?, ?)
+    ON CONFLICT(bev_id, recommended_bev_id) DO UPDATE SET
+        confidence = excluded.confidence
+"""
+_SQL_GET_SALES_TREND = """
+    SELECT transaction_date, transaction_count, sales_total, tax_total
+    FROM daily_sales
+    WHERE transaction_date >= date('now', ?)
+    ORDER BY transaction_date
+"""
+def _sales_trend_dicts(rows: List[tuple]) -> List[Dict[str, Any]]:
+    return [{
+        "date": row[0],
+        "transaction_count": row[1],
+        "sales_total": row[2],
+        "tax_total": row[3]
+    } for row in rows]
+
+# Two fixed statements, with and without the category filter, rather than
+# one assembled per call
+_SQL_POPULAR_ALL = """
+    SELECT id, name, category, subcategory, price, sales, order_count
+    FROM bevs
+    ORDER BY order_count DESC, sales DESC
+    LIMIT ?
+"""
+_SQL_POPULAR_CAT = """
+    SELECT id, name, category, subcategory, price, sales, order_count
+    FROM bevs
+    WHERE category = ?
+    ORDER BY order_count DESC, sales DESC
+    LIMIT ?
+"""
+_SQL_GET_BATCH_QUANTITIES = """
+    SELECT bev_id, SUM(quantity)
+    FROM batch_items
+    WHERE batch_id = ?
+    GROUP BY bev_id
+"""
+# Relative, and skips rows without enough stock so callers can check rowcount
+_SQL_TAKE_STOCK = """
+    UPDATE bevs 
+    SET inventory = inventory - ?, 
+        sales = sales + ?
+    WHERE id = ? AND inventory >= ?
+"""
+_SQL_SET_BATCH_STATUS = "UPDATE order_batches SET status = ? WHERE batch_id = ?"
+# Claims a batch for payment; a rowcount of 0 means it was already paid,
+# completed or cancelled
+_SQL_PAY_PENDING_BATCH = "UPDATE order_batches SET status = 'paid' WHERE batch_id = ? AND status = 'pending'"
+# SQLite sums quantity * price over the whole batch alongside each item
+_SQL_GET_BATCH_ITEMS = """
+    SELECT bi.item_id, b.name, bi.quantity, b.price, bi.notes, bi.status,
+           SUM(bi.quantity * b.price) OVER () AS subtotal
+    FROM batch_items bi
+    JOIN bevs b ON bi.bev_id = b.id
+    WHERE bi.batch_id = ?
+    ORDER BY bi.item_id
+"""
+
+@dataclass(slots=True)
 class Bev:
     id: str
     name: str
@@ -21,22 +250,83 @@ class Bev:
 class DatabaseDriver:
     def __init__(self, db_path: str = "auto_db.sqlite"):
         self.db_path = db_path
+        # One connection for the driver's lifetime; callers on worker threads
+        # (asyncio.to_thread) share it under the re-entrant lock
+        # The statement cache is sized well above the number of distinct SQL
+        # strings the driver issues, so none of them is ever evicted
+        self._conn = connect(db_path, check_same_thread=False, cached_statements=256)
+        self._lock = threading.RLock()
+        # How many _get_connection blocks are open on the lock-holding thread
+        self._depth = 0
+        atexit.register(close, self._conn)
+        # Read-only connections for the analytics queries, opened on demand so
+        # dashboards read alongside writers instead of waiting on _lock
+        self._readonly_pool: queue.LifoQueue = queue.LifoQueue(_READONLY_POOL_SIZE)
+        atexit.register(self._close_readonly_pool)
+        # {tax_type: (tax_id, rate)}, loaded on first use by _get_tax_rates
+        self._tax_cache: Optional[Dict[str, Tuple[int, float]]] = None
         self._init_db()
         if not self._has_data():
             self._load_initial_data()
 
     @contextmanager
     def _get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+        """Yield the shared connection inside a transaction.
+
+        The outermost block commits on success and rolls back on error via
+        sqlite3's own connection context manager; nested blocks (helpers
+        called from inside another method) join the enclosing transaction.
+        """
+        with self._lock:
+            self._depth += 1
+            try:
+                if self._depth > 1:
+                    yield self._conn
+                else:
+                    with self._conn:
+                        yield self._conn
+            finally:
+                self._depth -= 1
+
+    @contextmanager
+    def _get_readonly_connection(self):
+        """Borrow a read-only connection from the pool, opening one if none is idle"""
+        try:
+            conn = self._readonly_pool.get_nowait()
+        except queue.Empty:
+            uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+            conn = connect(uri, pragmas=_READONLY_PRAGMAS, uri=True,
+                           check_same_thread=False, cached_statements=256)
         try:
             yield conn
         finally:
-            conn.close()
+            # End the read so the next borrower sees fresh data
+            conn.rollback()
+            try:
+                self._readonly_pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _close_readonly_pool(self):
+        while True:
+            try:
+                self._readonly_pool.get_nowait().close()
+            except queue.Empty:
+                return
 
     def _init_db(self):
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
+            # A database already at the current version needs no DDL
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] >= _SCHEMA_VERSION:
+                return
+            
+            # sqlite3 doesn't open a transaction for DDL on its own; begin one
+            # so the whole schema plus the version stamp commit together
+            cursor.execute("BEGIN")
+            
             # Create bevs table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS bevs (
@@ -49,9 +339,14 @@ class DatabaseDriver:
                     image TEXT NOT NULL,
                     sales INTEGER DEFAULT 0,
                     supplier_id INTEGER,
+                    order_count INTEGER NOT NULL DEFAULT 0,
                     FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id)
                 )
             """)
+            # Databases created before order_count existed get the column added
+            cursor.execute("PRAGMA table_info(bevs)")
+            if "order_count" not in {column[1] for column in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE bevs ADD COLUMN order_count INTEGER NOT NULL DEFAULT 0")
 
             # Create suppliers table
             cursor.execute("""
@@ -205,27 +500,136 @@ class DatabaseDriver:
                 )
             """)
             
+            # Per-day totals for get_sales_trend, kept in step with
+            # transactions by the triggers below
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS daily_sales (
+                    transaction_date DATE PRIMARY KEY,
+                    transaction_count INTEGER NOT NULL,
+                    sales_total REAL NOT NULL,
+                    tax_total REAL NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_daily_sales_insert
+                AFTER INSERT ON transactions
+                BEGIN
+                    INSERT INTO daily_sales (transaction_date, transaction_count, sales_total, tax_total)
+                    VALUES (NEW.transaction_date, 1, NEW.total_amount, NEW.tax_amount)
+                    ON CONFLICT(transaction_date) DO UPDATE SET
+                        transaction_count = transaction_count + 1,
+                        sales_total = sales_total + excluded.sales_total,
+                        tax_total = tax_total + excluded.tax_total;
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_daily_sales_delete
+                AFTER DELETE ON transactions
+                BEGIN
+                    UPDATE daily_sales SET
+                        transaction_count = transaction_count - 1,
+                        sales_total = sales_total - OLD.total_amount,
+                        tax_total = tax_total - OLD.tax_amount
+                    WHERE transaction_date = OLD.transaction_date;
+                    DELETE FROM daily_sales
+                    WHERE transaction_date = OLD.transaction_date AND transaction_count <= 0;
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_daily_sales_update
+                AFTER UPDATE OF transaction_date, total_amount, tax_amount ON transactions
+                BEGIN
+                    UPDATE daily_sales SET
+                        transaction_count = transaction_count - 1,
+                        sales_total = sales_total - OLD.total_amount,
+                        tax_total = tax_total - OLD.tax_amount
+                    WHERE transaction_date = OLD.transaction_date;
+                    DELETE FROM daily_sales
+                    WHERE transaction_date = OLD.transaction_date AND transaction_count <= 0;
+                    INSERT INTO daily_sales (transaction_date, transaction_count, sales_total, tax_total)
+                    VALUES (NEW.transaction_date, 1, NEW.total_amount, NEW.tax_amount)
+                    ON CONFLICT(transaction_date) DO UPDATE SET
+                        transaction_count = transaction_count + 1,
+                        sales_total = sales_total + excluded.sales_total,
+                        tax_total = tax_total + excluded.tax_total;
+                END
+            """)
+            # bevs.order_count counts the transaction_items rows for each
+            # beverage, so get_popular_items needs no join
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_order_count_insert
+                AFTER INSERT ON transaction_items
+                BEGIN
+                    UPDATE bevs SET order_count = order_count + 1 WHERE id = NEW.item_id;
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_order_count_delete
+                AFTER DELETE ON transaction_items
+                BEGIN
+                    UPDATE bevs SET order_count = order_count - 1 WHERE id = OLD.item_id;
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_order_count_update
+                AFTER UPDATE OF item_id ON transaction_items
+                BEGIN
+                    UPDATE bevs SET order_count = order_count - 1 WHERE id = OLD.item_id;
+                    UPDATE bevs SET order_count = order_count + 1 WHERE id = NEW.item_id;
+                END
+            """)
+            cursor.execute("""
+                UPDATE bevs SET order_count = (
+                    SELECT COUNT(*) FROM transaction_items ti WHERE ti.item_id = bevs.id
+                )
+            """)
+            
+            # Covers the per-day totals so the rebuild below reads the index in
+            # date order without touching the table; it supersedes the plain
+            # transaction_date index
+            cursor.execute("DROP INDEX IF EXISTS idx_transactions_date")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tx_date_cover ON transactions(transaction_date, total_amount, tax_amount)")
+            
+            # Rebuild from whatever transactions the database already holds
+            cursor.execute("DELETE FROM daily_sales")
+            cursor.execute("""
+                INSERT INTO daily_sales (transaction_date, transaction_count, sales_total, tax_total)
+                SELECT transaction_date, COUNT(*), SUM(total_amount), SUM(tax_amount)
+                FROM transactions
+                GROUP BY transaction_date
+            """)
+            
             # Create indexes for better query performance
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(transaction_date)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_date ON events(event_date)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_transaction_items_transaction ON transaction_items(transaction_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_batch_items_batch ON batch_items(batch_id)")
+            # Composite indexes cover the filter column plus the bevs join key;
+            # they make the old single-column indexes redundant
+            cursor.execute("DROP INDEX IF EXISTS idx_transaction_items_transaction")
+            cursor.execute("DROP INDEX IF EXISTS idx_batch_items_batch")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ti_txn_item ON transaction_items(transaction_id, item_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_batch_items_batch_bev ON batch_items(batch_id, bev_id)")
+            # Serves the get_recommendations same-category fallback
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_bevs_category_subcategory ON bevs(category, subcategory, sales DESC)")
+            # Serves the get_popular_items join from bevs to its sales
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ti_item ON transaction_items(item_id)")
+            # get_popular_items reads these in order, with and without a category
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_bevs_order_count ON bevs(category, order_count DESC, sales DESC)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_bevs_popular ON bevs(order_count DESC, sales DESC)")
+            # One row per beverage pair; drop any duplicates an older
+            # database picked up before the pair was made unique
+            cursor.execute("""
+                DELETE FROM drink_recommendations
+                WHERE recommendation_id NOT IN (
+                    SELECT MAX(recommendation_id)
+                    FROM drink_recommendations
+                    GROUP BY bev_id, recommended_bev_id
+                )
+            """)
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_reco_pair ON drink_recommendations(bev_id, recommended_bev_id)")
+            
+            # Give the planner statistics for the new indexes
+            cursor.execute("ANALYZE")
+            cursor.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
             
-            conn.commit()
-
-    def _migrate_existing_table(self):
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            # Add category column to existing table if it doesn't exist
-            try:
-                cursor.execute("""
-                    ALTER TABLE bevs 
-                    ADD COLUMN category TEXT DEFAULT 'Uncategorized'
-                """)
-                conn.commit()
-            except Exception as e:
-                # Column might already exist
-                pass
 
     def _has_data(self) -> bool:
         with self._get_connection() as conn:
@@ -234,21 +638,30 @@ class DatabaseDriver:
             count = cursor.fetchone()[0]
             return count > 0
 
-    def _generate_id(self, name: str) -> str:
-        return name.lower().replace(" ", "_")
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _generate_id(name: str) -> str:
+        if name.isascii():
+            return name.translate(_ID_TABLE)
+        # str.lower() still handles non-ASCII capitals
+        return name.lower().translate(_ID_TABLE)
 
     def _load_initial_data(self):
         json_path = os.path.join(os.path.dirname(__file__), "drinks.json")
         if not os.path.exists(json_path):
             return
 
-        with open(json_path, 'r') as f:
-            drinks = json.load(f)
+        with open(json_path, 'rb') as f:
+            # With ijson the array is parsed one drink at a time as
+            # executemany consumes it, instead of being loaded whole
+            if ijson is not None:
+                drinks = ijson.items(f, 'item', use_float=True)
+            else:
+                drinks = json.load(f)
 
-        for drink in drinks:
-            id = self._generate_id(drink['name'])
-            self.create_bev(
-                id=id,
+            # One statement and one transaction for the whole seed set
+            self.create_bevs(Bev(
+                id=self._generate_id(drink['name']),
                 name=drink['name'],
                 category=drink['category'],
                 subcategory=drink['subcategory'],
@@ -256,52 +669,62 @@ class DatabaseDriver:
                 inventory=drink['inventory'],
                 image="",  # Default empty image URL
                 sales=drink.get('sales', 0)
-            )
+            ) for drink in drinks)
 
-    def _bev_exists(self, id: str) -> bool:
+        # Refresh planner statistics now the tables hold the seed data
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1 FROM bevs WHERE id = ?", (id,))
-            return cursor.fetchone() is not None
+            conn.execute("ANALYZE")
 
     def create_bev(self, id: str, name: str, category: str, subcategory: str, price: int, inventory: int, image: str, sales: int = 0) -> Bev:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            if self._bev_exists(id):
-                # Update existing record
-                cursor.execute("""
-                    UPDATE bevs 
-                    SET name=?, category=?, subcategory=?, price=?, inventory=?, image=?, sales=?
-                    WHERE id=?
-                """, (name, category, subcategory, price, inventory, image, sales, id))
-            else:
-                # Insert new record
-                cursor.execute("""
-                    INSERT INTO bevs (id, name, category, subcategory, price, inventory, image, sales) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (id, name, category, subcategory, price, inventory, image, sales))
-            conn.commit()
+            cursor.execute(_SQL_UPSERT_BEV, (id, name, category, subcategory, price, inventory, image, sales))
             return Bev(id=id, name=name, category=category, subcategory=subcategory, 
                       price=price, inventory=inventory, image=image, sales=sales)
 
+    def create_bevs(self, bevs: Iterable[Bev]) -> None:
+        """Insert or update many beverages with one executemany in one transaction"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(_SQL_UPSERT_BEV, (
+                (bev.id, bev.name, bev.category, bev.subcategory,
+                 bev.price, bev.inventory, bev.image, bev.sales)
+                for bev in bevs
+            ))
+
     def get_bev_by_id(self, id: str) -> Optional[Bev]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM bevs WHERE id = ?", (id,))
+            cursor.execute(_SQL_GET_BEV, (id,))
             row = cursor.fetchone()
             if not row:
                 return None
             
-            return Bev(
-                id=row[0],
-                name=row[1],
-                category=row[2],
-                subcategory=row[3],
-                price=row[4],
-                inventory=row[5],
-                image=row[6],
-                sales=row[7]
-            )
+            return Bev(*row)
+
+    def resolve_bev(self, bev_id: str) -> Tuple[str, Optional[Bev]]:
+        """Look up a beverage by id, falling back to the id generated from a name"""
+        bev = self.get_bev_by_id(bev_id)
+        if bev is None:
+            generated_id = self._generate_id(bev_id)
+            if generated_id != bev_id:
+                bev = self.get_bev_by_id(generated_id)
+                if bev is not None:
+                    bev_id = generated_id
+        return bev_id, bev
+
+    def _get_tax_rates(self) -> Dict[str, Tuple[int, float]]:
+        """Return the cached tax_rates table, reading it on first use"""
+        if self._tax_cache is None:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(_SQL_GET_TAX_RATES)
+                tax_cache = {}
+                for tax_type, tax_id, rate in cursor:
+                    # Lowest id wins, matching the old fetchone() lookups
+                    tax_cache.setdefault(tax_type, (tax_id, rate))
+                self._tax_cache = tax_cache
+        return self._tax_cache
 
     def initialize_tax_rates(self):
         """Initialize default tax rates if not exists"""
@@ -322,7 +745,7 @@ class DatabaseDriver:
                     "INSERT INTO tax_rates (tax_type, rate, description) VALUES (?, ?, ?)",
                     default_rates
                 )
-                conn.commit()
+                self._tax_cache = None
 
     def calculate_item_tax(self, item_id: str, quantity: int, tax_category: str) -> Tuple[float, float]:
         """Calculate tax for a transaction item"""
@@ -330,7 +753,7 @@ class DatabaseDriver:
             cursor = conn.cursor()
             
             # Get the item price
-            cursor.execute("SELECT price FROM bevs WHERE id = ?", (item_id,))
+            cursor.execute(_SQL_GET_PRICE, (item_id,))
             price_row = cursor.fetchone()
             if not price_row:
                 return 0.0, 0.0
@@ -339,9 +762,7 @@ class DatabaseDriver:
             line_total = unit_price * quantity
             
             # Get the tax rate for this category
-            cursor.execute("SELECT rate FROM tax_rates WHERE tax_type = ?", (tax_category,))
-            tax_row = cursor.fetchone()
-            tax_rate = tax_row[0] if tax_row else 0.07  # Default to 7% if no specific rate
+            _, tax_rate = self._get_tax_rates().get(tax_category, (None, 0.07))  # Default to 7% if no specific rate
             
             tax_amount = line_total * tax_rate
             
@@ -349,83 +770,63 @@ class DatabaseDriver:
 
     def record_tax_detail(self, transaction_item_id: int, tax_category: str, tax_amount: float):
         """Record detailed tax information for a transaction item"""
+        # Get tax_id for the category
+        tax_id, _ = self._get_tax_rates().get(tax_category, (None, None))
+        if tax_id is None:
+            return
+        
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            # Get tax_id for the category
-            cursor.execute("SELECT tax_id FROM tax_rates WHERE tax_type = ?", (tax_category,))
-            tax_row = cursor.fetchone()
-            if not tax_row:
-                return
-                
-            tax_id = tax_row[0]
-            
             # Record tax detail
-            cursor.execute("""
-                INSERT INTO tax_details (transaction_item_id, tax_id, calculated_tax_amount)
-                VALUES (?, ?, ?)
-            """, (transaction_item_id, tax_id, tax_amount))
+            cursor.execute(_SQL_INSERT_TAX_DETAIL, (transaction_item_id, tax_id, tax_amount))
             
-            conn.commit()
 
     def create_transaction(self, payment_method: str, items: list, employee_id: Optional[int] = None) -> int:
         """Create a new transaction with items and tax tracking"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            now = datetime.now()
-            
-            # Format date and time as strings for SQLite
-            date_str = now.date().isoformat()
-            time_str = now.time().isoformat()
             
-            # Create transaction
-            cursor.execute("""
-                INSERT INTO transactions (
-                    transaction_date, transaction_time, total_amount, 
-                    tax_amount, payment_method, employee_id
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                date_str, time_str, 0, 0, payment_method, employee_id
-            ))
+            # Look up every price and tax rate once instead of per item
+            bev_ids = list({item['id'] for item in items})
+            prices = {}
+            if bev_ids:
+                cursor.execute(_SQL_GET_PRICES, (json.dumps(bev_ids),))
+                prices = dict(cursor.fetchall())
+            tax_rates = self._get_tax_rates()
             
-            transaction_id = cursor.lastrowid
+            # Process items with tax calculations
+            item_rows = []
             total_amount = 0
             total_tax = 0
-            
-            # Process items with tax calculations
             for item in items:
                 bev_id = item['id']
                 quantity = item['quantity']
                 tax_category = item.get('tax_category', 'pour/shot')  # Default to pour/shot
                 
-                line_total, tax_amount = self.calculate_item_tax(bev_id, quantity, tax_category)
+                unit_price = prices.get(bev_id, 0)
+                line_total = unit_price * quantity
+                _, tax_rate = tax_rates.get(tax_category, (None, 0.07))  # Default to 7% if no specific rate
+                tax_amount = line_total * tax_rate
                 
-                # Create transaction item
-                cursor.execute("""
-                    INSERT INTO transaction_items (
-                        transaction_id, item_id, quantity, unit_price,
-                        line_total, tax_category, tax_amount
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    transaction_id, bev_id, quantity,
-                    line_total/quantity if quantity > 0 else 0, line_total,
-                    tax_category, tax_amount
+                item_rows.append((
+                    bev_id, quantity, unit_price if quantity > 0 else 0,
+                    line_total, tax_category, tax_amount
                 ))
-                
-                # Record tax detail
-                self.record_tax_detail(cursor.lastrowid, tax_category, tax_amount)
-                
                 total_amount += line_total
                 total_tax += tax_amount
             
-            # Update transaction totals
-            cursor.execute("""
-                UPDATE transactions 
-                SET total_amount = ?, tax_amount = ?
-                WHERE transaction_id = ?
-            """, (total_amount, total_tax, transaction_id))
+            # Create transaction with its totals already known; SQLite stamps
+            # the local date and time itself
+            cursor.execute(_SQL_INSERT_TXN, (total_amount, total_tax, payment_method, employee_id))
+            transaction_id = cursor.lastrowid
+            
+            # Create transaction items
+            cursor.executemany(_SQL_INSERT_TI, [(transaction_id, *row) for row in item_rows])
+            
+            # Record tax details for every item whose category has a tax rate
+            cursor.execute(_SQL_INSERT_TAX_DETAILS_FOR_TXN, (transaction_id,))
             
-            conn.commit()
             return transaction_id
 
     def delete_bev(self, id: str) -> bool:
@@ -433,25 +834,29 @@ class DatabaseDriver:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM bevs WHERE id = ?", (id,))
-            conn.commit()
             return cursor.rowcount > 0
 
     def get_bevs_by_category(self, category: str) -> List[Bev]:
-        """Get all beverages in a category"""
-        with self._get_connection() as conn:
+        """Get all beverages in a category, ordered by name"""
+        return list(self.iter_bevs_by_category(category))
+
+    def iter_bevs_by_category(self, category: str) -> Iterator[Bev]:
+        """Yield beverages in a category one row at a time, ordered by name"""
+        with self._get_readonly_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM bevs WHERE category = ?", (category,))
-            rows = cursor.fetchall()
-            return [Bev(
-                id=row[0],
-                name=row[1],
-                category=row[2],
-                subcategory=row[3],
-                price=row[4],
-                inventory=row[5],
-                image=row[6],
-                sales=row[7]
-            ) for row in rows]
+            cursor.execute(_SQL_GET_BEVS_BY_CATEGORY, (category,))
+            while True:
+                rows = cursor.fetchmany(256)
+                if not rows:
+                    break
+                yield from (Bev(*row) for row in rows)
+
+    def get_bevs_by_categories(self, categories: Iterable[str]) -> List[Bev]:
+        """Get the beverages of several categories with a single query"""
+        with self._get_readonly_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SQL_GET_BEVS_BY_CATEGORIES, (json.dumps(list(categories)),))
+            return [Bev(*row) for row in cursor.fetchall()]
 
     def create_event(self, name: str, event_type: str, date: str, time: str, 
                     venue: str, client_id: Optional[int] = None, 
@@ -464,7 +869,6 @@ class DatabaseDriver:
                                   venue, client_id, description)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (name, event_type, date, time, venue, client_id, description))
-            conn.commit()
             return cursor.lastrowid
 
     def create_event_booking(self, event_id: int, service_type: str, 
@@ -478,15 +882,18 @@ class DatabaseDriver:
                                           service_details, cost)
                 VALUES (?, ?, ?, ?, ?)
             """, (event_id, service_type, drink_package, details, cost))
-            conn.commit()
             return cursor.lastrowid
 
     def get_event_details(self, event_id: int) -> Optional[dict]:
         """Get event details including bookings"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            # Only the columns the dict needs, so later schema additions
+            # can't shift the row indices below
             cursor.execute("""
-                SELECT e.*, eb.service_type, eb.drink_package, eb.cost 
+                SELECT e.event_id, e.event_name, e.event_type, e.event_date, e.event_time,
+                       e.venue, e.description, e.client_id, e.status,
+                       eb.drink_package, eb.cost
                 FROM events e
                 LEFT JOIN event_bookings eb ON e.event_id = eb.event_id
                 WHERE e.event_id = ?
@@ -504,8 +911,8 @@ class DatabaseDriver:
                 "description": row[6],
                 "client_id": row[7],
                 "status": row[8],
-                "drink_package": row[10],
-                "package_cost": row[11]
+                "drink_package": row[9],
+                "package_cost": row[10]
             }
 
     def get_revenue_summary(self, date: Optional[str] = None, 
@@ -513,7 +920,9 @@ class DatabaseDriver:
         """Get revenue summary for a date/shift"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            query = "SELECT * FROM revenue_summary WHERE 1=1"
+            query = """
+                SELECT date, shift, total_sales, total_tax, number_of_transactions
+                FROM revenue_summary WHERE 1=1"""
             params = []
             if date:
                 query += " AND date = ?"
@@ -527,11 +936,11 @@ class DatabaseDriver:
             if not row:
                 return None
             return {
-                "date": row[1],
-                "shift": row[2],
-                "total_sales": row[3],
-                "total_tax": row[4],
-                "transactions": row[5]
+                "date": row[0],
+                "shift": row[1],
+                "total_sales": row[2],
+                "total_tax": row[3],
+                "transactions": row[4]
             }
 
     def generate_receipt(self, transaction_id: int) -> Dict[str, Any]:
@@ -540,25 +949,14 @@ class DatabaseDriver:
             cursor = conn.cursor()
             
             # Get transaction details
-            cursor.execute("""
-                SELECT t.transaction_id, t.transaction_date, t.transaction_time, 
-                       t.total_amount, t.tax_amount, t.payment_method
-                FROM transactions t
-                WHERE t.transaction_id = ?
-            """, (transaction_id,))
+            cursor.execute(_SQL_GET_TXN, (transaction_id,))
             
             transaction = cursor.fetchone()
             if not transaction:
                 return {"error": "Transaction not found"}
             
             # Get transaction items
-            cursor.execute("""
-                SELECT ti.item_id, b.name, ti.quantity, ti.unit_price, 
-                       ti.line_total, ti.tax_amount
-                FROM transaction_items ti
-                JOIN bevs b ON ti.item_id = b.id
-                WHERE ti.transaction_id = ?
-            """, (transaction_id,))
+            cursor.execute(_SQL_GET_TXN_ITEMS, (transaction_id,))
             
             items = cursor.fetchall()
             
@@ -587,22 +985,24 @@ class DatabaseDriver:
         """Create a new batch order"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO order_batches (table_number, customer_id)
-                VALUES (?, ?)
-            """, (table_number, customer_id))
-            conn.commit()
+            cursor.execute(_SQL_INSERT_BATCH, (table_number, customer_id))
             return cursor.lastrowid
     
     def add_to_batch(self, batch_id: int, bev_id: str, quantity: int, notes: Optional[str] = None) -> bool:
         """Add an item to a batch order"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO batch_items (batch_id, bev_id, quantity, notes)
-                VALUES (?, ?, ?, ?)
-            """, (batch_id, bev_id, quantity, notes))
-            conn.commit()
+            cursor.execute(_SQL_INSERT_BATCH_ITEM, (batch_id, bev_id, quantity, notes))
+            return True
+    
+    def add_items_to_batch(self, batch_id: int, items: Iterable[Dict[str, Any]]) -> bool:
+        """Add many items ({"id", "quantity", optional "notes"}) to a batch order at once"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(_SQL_INSERT_BATCH_ITEM, (
+                (batch_id, item['id'], item['quantity'], item.get('notes'))
+                for item in items
+            ))
             return True
     
     def get_batch_order(self, batch_id: int) -> Dict[str, Any]:
@@ -611,28 +1011,19 @@ class DatabaseDriver:
             cursor = conn.cursor()
             
             # Get batch details
-            cursor.execute("""
-                SELECT batch_id, order_time, table_number, status, customer_id
-                FROM order_batches
-                WHERE batch_id = ?
-            """, (batch_id,))
+            cursor.execute(_SQL_GET_BATCH, (batch_id,))
             
             batch = cursor.fetchone()
             if not batch:
                 return {"error": "Batch order not found"}
             
-            # Get batch items
-            cursor.execute("""
-                SELECT bi.item_id, b.name, bi.quantity, b.price, bi.notes, bi.status
-                FROM batch_items bi
-                JOIN bevs b ON bi.bev_id = b.id
-                WHERE bi.batch_id = ?
-            """, (batch_id,))
+            # Get batch items, with SQLite summing quantity * price over the batch
+            cursor.execute(_SQL_GET_BATCH_ITEMS, (batch_id,))
             
             items = cursor.fetchall()
             
             # Calculate totals
-            subtotal = sum([item[2] * item[3] for item in items])  # quantity * price
+            subtotal = items[0][6] if items else 0
             tax_rate = 0.07  # Default tax rate
             tax = subtotal * tax_rate
             total = subtotal + tax
@@ -660,77 +1051,43 @@ class DatabaseDriver:
     
     def process_batch_to_transaction(self, batch_id: int, payment_method: str) -> int:
         """Process a batch order into a transaction"""
-        batch = self.get_batch_order(batch_id)
-        if "error" in batch:
-            return -1
-        
-        # Create transaction items from batch
-        items = []
-        for item in batch["items"]:
-            items.append({
-                "id": item["id"],
-                "quantity": item["quantity"],
-                "tax_category": "pour/shot"  # Default tax category
-            })
-        
-        # Create transaction
-        transaction_id = self.create_transaction(payment_method, items)
-        
-        # Update batch status
+        # One block, so the transaction insert and the status update commit
+        # together; create_transaction joins it rather than committing alone
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE order_batches 
-                SET status = 'completed' 
-                WHERE batch_id = ?
-            """, (batch_id,))
-            conn.commit()
-        
-        return transaction_id
+            
+            # Read just the batch's beverages and quantities; the LEFT JOIN
+            # still yields a row for an existing batch with no items
+            cursor.execute(_SQL_GET_BATCH_BEVS, (batch_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                return -1
+            
+            # Create transaction items from batch
+            items = [
+                {
+                    "id": bev_id,
+                    "quantity": quantity,
+                    "tax_category": "pour/shot"  # Default tax category
+                } for bev_id, quantity in rows if bev_id is not None
+            ]
+            
+            # Create transaction
+            transaction_id = self.create_transaction(payment_method, items)
+            
+            # Update batch status
+            cursor.execute(_SQL_SET_BATCH_STATUS, ("completed", batch_id))
+            
+            return transaction_id
     
     def get_recommendations(self, bev_id: str, limit: int = 3) -> List[Dict[str, Any]]:
         """Get beverage recommendations based on a current beverage"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            # First check for explicit recommendations
-            cursor.execute("""
-                SELECT r.recommended_bev_id, b.name, b.category, b.price, r.confidence
-                FROM drink_recommendations r
-                JOIN bevs b ON r.recommended_bev_id = b.id
-                WHERE r.bev_id = ?
-                ORDER BY r.confidence DESC
-                LIMIT ?
-            """, (bev_id, limit))
-            
+            cursor.execute(_SQL_GET_RECOMMENDATIONS, (bev_id, bev_id, limit))
             recommendations = cursor.fetchall()
             
-            # If no explicit recommendations, find similar beverages in the same category
-            if not recommendations:
-                # Get the beverage's category and subcategory
-                cursor.execute("""
-                    SELECT category, subcategory
-                    FROM bevs
-                    WHERE id = ?
-                """, (bev_id,))
-                
-                bev_data = cursor.fetchone()
-                if not bev_data:
-                    return []
-                
-                # Find beverages in the same category/subcategory
-                cursor.execute("""
-                    SELECT id, name, category, price, inventory
-                    FROM bevs
-                    WHERE category = ? AND subcategory = ? AND id != ?
-                    ORDER BY sales DESC
-                    LIMIT ?
-                """, (bev_data[0], bev_data[1], bev_id, limit))
-                
-                similar_bevs = cursor.fetchall()
-                
-                recommendations = [(bev[0], bev[1], bev[2], bev[3], 0.7) for bev in similar_bevs]
-            
             return [
                 {
                     "id": rec[0],
@@ -746,80 +1103,45 @@ class DatabaseDriver:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            # Check if recommendation already exists
-            cursor.execute("""
-                SELECT recommendation_id
-                FROM drink_recommendations
-                WHERE bev_id = ? AND recommended_bev_id = ?
-            """, (bev_id, recommended_bev_id))
-            
-            existing = cursor.fetchone()
+            # Create the recommendation, or update the existing one for this
+            # pair through its unique index
+            cursor.execute(_SQL_UPSERT_RECOMMENDATION, (bev_id, recommended_bev_id, confidence))
             
-            if existing:
-                # Update existing recommendation
-                cursor.execute("""
-                    UPDATE drink_recommendations
-                    SET confidence = ?
-                    WHERE bev_id = ? AND recommended_bev_id = ?
-                """, (confidence, bev_id, recommended_bev_id))
-            else:
-                # Create new recommendation
-                cursor.execute("""
-                    INSERT INTO drink_recommendations (bev_id, recommended_bev_id, confidence)
-                    VALUES (?, ?, ?)
-                """, (bev_id, recommended_bev_id, confidence))
-            
-            conn.commit()
             return True
     
     def get_sales_trend(self, days: int = 30) -> List[Dict[str, Any]]:
         """Get sales trend data for the specified number of days"""
-        with self._get_connection() as conn:
+        with self._get_readonly_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT transaction_date, 
-                       COUNT(*) as transaction_count, 
-                       SUM(total_amount) as sales_total,
-                       SUM(tax_amount) as tax_total
-                FROM transactions 
-                WHERE transaction_date >= date('now', ?)
-                GROUP BY transaction_date
-                ORDER BY transaction_date
-            """, (f"-{days} days",))
+            # Read the pre-aggregated daily totals rather than grouping
+            # every transaction on each call
+            cursor.execute(_SQL_GET_SALES_TREND, (f"-{days} days",))
             
-            rows = cursor.fetchall()
-            return [{
-                "date": row[0],
-                "transaction_count": row[1],
-                "sales_total": row[2],
-                "tax_total": row[3]
-            } for row in rows]
+            return _sales_trend_dicts(cursor.fetchall())
+
+    def get_menu_and_sales_trend(self, categories: Iterable[str], days: int = 30) -> Tuple[List[Bev], List[Dict[str, Any]]]:
+        """Get get_bevs_by_categories and get_sales_trend results from one
+        connection and one consistent snapshot, for the dashboard"""
+        with self._get_readonly_connection() as conn:
+            cursor = conn.cursor()
+            # Both reads see the same database state; the pool's rollback
+            # ends the read transaction
+            cursor.execute("BEGIN")
+            cursor.execute(_SQL_GET_BEVS_BY_CATEGORIES, (json.dumps(list(categories)),))
+            bevs = [Bev(*row) for row in cursor.fetchall()]
+            cursor.execute(_SQL_GET_SALES_TREND, (f"-{days} days",))
+            return bevs, _sales_trend_dicts(cursor.fetchall())
     
     def get_popular_items(self, category: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
         """Get the most popular items based on sales"""
-        with self._get_connection() as conn:
+        with self._get_readonly_connection() as conn:
             cursor = conn.cursor()
             
-            query = """
-                SELECT b.id, b.name, b.category, b.subcategory, 
-                       b.price, b.sales, COUNT(ti.item_id) as order_count
-                FROM bevs b
-                LEFT JOIN transaction_items ti ON b.id = ti.item_id
-            """
-            
-            params = []
+            # order_count is kept current by triggers on transaction_items
             if category:
-                query += " WHERE b.category = ?"
-                params.append(category)
-            
-            query += """
-                GROUP BY b.id
-                ORDER BY order_count DESC, b.sales DESC
-                LIMIT ?
-            """
-            params.append(limit)
-            
-            cursor.execute(query, params)
+                cursor.execute(_SQL_POPULAR_CAT, (category, limit))
+            else:
+                cursor.execute(_SQL_POPULAR_ALL, (limit,))
             rows = cursor.fetchall()
             
             return [{
@@ -832,67 +1154,53 @@ class DatabaseDriver:
                 "order_count": row[6]
             } for row in rows]
 
-    def finalize_batch(self, batch_id: int, payment_method: str = "cash") -> bool:
+    def finalize_batch(self, batch_id: int, payment_method: str = "cash",
+                       employee_id: Optional[int] = None) -> Optional[int]:
         """
         Finalize a batch order and process payment
         
         Args:
             batch_id: The ID of the batch to finalize
             payment_method: Payment method (cash/card)
+            employee_id: The employee processing the order
             
         Returns:
-            bool: True if successful, False otherwise
+            Optional[int]: The new transaction ID if successful, None otherwise
         """
         try:
-            # Get batch details
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT items.bev_id, items.quantity, beverages.price, beverages.inventory 
-                FROM batch_items items
-                JOIN beverages ON items.bev_id = beverages.id
-                WHERE items.batch_id = ?
-            """, (batch_id,))
-            items = cursor.fetchall()
-            
-            if not items:
-                return False
+            # Stock, transaction and batch status commit or roll back together
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
                 
-            # Calculate total
-            total = sum(quantity * price for _, quantity, price, _ in items)
-            
-            # Update inventory and mark batch as paid
-            cursor.execute("BEGIN TRANSACTION")
-            try:
-                for bev_id, quantity, _, curr_inventory in items:
-                    new_inventory = curr_inventory - quantity
-                    if new_inventory < 0:
-                        cursor.execute("ROLLBACK")
-                        return False
-                    cursor.execute("""
-                        UPDATE beverages 
-                        SET inventory = ?, 
-                            sales = sales + ?
-                        WHERE id = ?
-                    """, (new_inventory, quantity, bev_id))
+                # Get batch items, one row per beverage
+                cursor.execute(_SQL_GET_BATCH_QUANTITIES, (batch_id,))
+                items = cursor.fetchall()
                 
-                cursor.execute("""
-                    UPDATE batches 
-                    SET status = 'paid',
-                        payment_method = ?,
-                        total = ?
-                    WHERE id = ?
-                """, (payment_method, total, batch_id))
+                if not items:
+                    return None
                 
-                cursor.execute("COMMIT")
-                return True
+                # Only a pending batch may be paid, so finalizing twice (or
+                # after cancelling) can't take stock or bill a second time
+                cursor.execute(_SQL_PAY_PENDING_BATCH, (batch_id,))
+                if cursor.rowcount == 0:
+                    return None
                 
-            except Exception as e:
-                cursor.execute("ROLLBACK")
-                raise e
+                # Take every item out of stock in one executemany. The update is
+                # relative and skips rows without enough inventory, so a short
+                # rowcount means the batch can't be filled
+                cursor.executemany(_SQL_TAKE_STOCK, [(quantity, quantity, bev_id, quantity) for bev_id, quantity in items])
+                if cursor.rowcount != len(items):
+                    raise ValueError(f"not enough inventory to fill batch {batch_id}")
+                
+                transaction_id = self.create_transaction(payment_method, [
+                    {"id": bev_id, "quantity": quantity} for bev_id, quantity in items
+                ], employee_id)
+                
+                return transaction_id
                 
         except Exception as e:
             print(f"Error finalizing batch: {e}")
-            return False
+            return None
 
     def cancel_batch(self, batch_id: int) -> bool:
         """
@@ -905,14 +1213,14 @@ class DatabaseDriver:
             bool: True if successful, False otherwise
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                UPDATE batches 
-                SET status = 'cancelled'
-                WHERE id = ? AND status = 'pending'
-            """, (batch_id,))
-            self.conn.commit()
-            return cursor.rowcount > 0
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE order_batches 
+                    SET status = 'cancelled'
+                    WHERE batch_id = ? AND status = 'pending'
+                """, (batch_id,))
+                return cursor.rowcount > 0
             
         except Exception as e:
             print(f"Error cancelling batch: {e}")
@@ -0,0 +1,12 @@
+"""gunicorn settings for the dashboard; run it with `gunicorn wsgi:app`"""
+import multiprocessing
+
+bind = "0.0.0.0:5000"
+workers = multiprocessing.cpu_count()
+worker_class = "gthread"
+# One per idle connection DatabaseDriver keeps in its read-only pool
+threads = 4
+# Every worker imports web_server itself and so opens its own SQLite
+# connections and page refresh thread; neither survives being forked from
+# a preloaded master
+preload_app = False
\ No newline at end of file
@@ -60,23 +60,33 @@ CATEGORIES = {
     "Non-Alcoholic": ["Sodas", "Juices", "Other"]
 }
 
-LOOKUP_BEV_MESSAGE = lambda msg: f"""Process the drink order if a name is provided.
+# Category list shared by the prompt strings below, joined once at import
+_CATEGORIES_JOINED = ', '.join(CATEGORIES.keys())
+
+# Everything but the user's message is fixed, so only that is formatted per call
+_LOOKUP_BEV_PREFIX = f"""Process the drink order if a name is provided.
 Only if the drink doesn't exist, ask for:
-- Category ({', '.join(CATEGORIES.keys())})
+- Category ({_CATEGORIES_JOINED})
 - Subcategory (based on category)
 - Price
 - Initial inventory
 
-User message: {msg}"""
+User message: """
+LOOKUP_BEV_MESSAGE = lambda msg: f"{_LOOKUP_BEV_PREFIX}{msg}"
 
 CATEGORY_HELP_MESSAGE = f"""
 Our menu is organized into the following categories:
-{', '.join(CATEGORIES.keys())}
+{_CATEGORIES_JOINED}
 
 Each category has specific types of drinks. Would you like to know more about any particular category?
 """
 
+# Help replies never change at runtime, so build them all once at import
+_UNKNOWN_CATEGORY_HELP = "That category doesn't exist in our menu. Please choose from: " + _CATEGORIES_JOINED
+_SUBCATEGORY_HELP = {
+    category: f"In {category} we have the following types: {', '.join(subcategories)}"
+    for category, subcategories in CATEGORIES.items()
+}
+
 def get_subcategory_help(category: str) -> str:
-    if category not in CATEGORIES:
-        return "That category doesn't exist in our menu. Please choose from: " + ', '.join(CATEGORIES.keys())
-    return f"In {category} we have the following types: {', '.join(CATEGORIES[category])}"
\ No newline at end of file
+    return _SUBCATEGORY_HELP.get(category, _UNKNOWN_CATEGORY_HELP)
\ No newline at end of file
@@ -0,0 +1,11 @@
+// Draws the dashboard charts from the data URL named on this script's tag.
+// Deferred after plotly.js, so Plotly is ready by the time this runs.
+fetch(document.currentScript.dataset.url)
+    .then(response => response.json())
+    .then(data => {
+        // Render menu chart
+        Plotly.newPlot('menu-chart', data.menu.data, data.menu.layout);
+
+        // Render sales chart
+        Plotly.newPlot('sales-chart', data.sales.data, data.sales.layout);
+    });
\ No newline at end of file
@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from agent import _transaction_reply
+
+RECOMMENDATIONS = [{"name": "Coors Light"}, {"name": "Miller Lite"}]
+
+
+def test_recommendations_follow_a_recorded_transaction():
+    reply = _transaction_reply(7, "Transaction 7 created successfully!", RECOMMENDATIONS)
+    assert reply.endswith("You might also like: Coors Light, Miller Lite")
+
+
+def test_failed_transaction_gets_no_recommendations():
+    reply = _transaction_reply(None, "Failed to create transaction", RECOMMENDATIONS)
+    assert reply == "Failed to create transaction"
+
+
+def test_find_category_matches_plurals_and_singulars():
+    from agent import _find_category
+
+    assert _find_category("what types of beers do you have in the beer category") == "Beer"
+    assert _find_category("what types of wines are there") == "Wine"
+    assert _find_category("which spirit category types") == "Spirits"
+    assert _find_category("any non-alcoholic types") == "Non-Alcoholic"
+    assert _find_category("what category types are there") is None
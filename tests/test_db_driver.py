@@ -0,0 +1,37 @@
+import pytest
+
+from db_driver import DatabaseDriver
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A driver on a fresh database, seeded from drinks.json"""
+    return DatabaseDriver(str(tmp_path / "test.sqlite"))
+
+
+def _stock(db, bev_id):
+    bev = db.get_bev_by_id(bev_id)
+    return bev.inventory, bev.sales
+
+
+def test_finalize_batch_twice_takes_stock_once(db):
+    batch_id = db.create_batch_order("T1")
+    db.add_to_batch(batch_id, "bud_light", 2)
+    before = _stock(db, "bud_light")
+
+    assert db.finalize_batch(batch_id) is not None
+    after_first = _stock(db, "bud_light")
+    assert after_first == (before[0] - 2, before[1] + 2)
+
+    assert db.finalize_batch(batch_id) is None
+    assert _stock(db, "bud_light") == after_first
+
+
+def test_finalize_cancelled_batch_leaves_stock(db):
+    batch_id = db.create_batch_order("T2")
+    db.add_to_batch(batch_id, "bud_light", 3)
+    before = _stock(db, "bud_light")
+
+    assert db.cancel_batch(batch_id)
+    assert db.finalize_batch(batch_id) is None
+    assert _stock(db, "bud_light") == before
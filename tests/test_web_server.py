@@ -0,0 +1,40 @@
+import importlib
+import re
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    """A test client for web_server, with its database in a temp directory"""
+    mp = pytest.MonkeyPatch()
+    # DatabaseDriver's default path is relative to the working directory
+    mp.chdir(tmp_path_factory.mktemp("web"))
+    web_server = importlib.import_module("web_server")
+    yield web_server.app.test_client()
+    mp.undo()
+
+
+def test_render_js_is_served_immutable(client):
+    page = client.get("/").get_data(as_text=True)
+    url = re.search(r'src="(/render\.[0-9a-f]+\.js)"', page).group(1)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.cache_control.max_age == 31536000
+    assert response.cache_control.immutable
+
+
+def test_stale_render_js_is_not_cached(client):
+    response = client.get("/render.0000000000000000.js")
+    assert response.status_code == 200
+    assert response.cache_control.no_cache
+
+
+def test_debug_timing_requires_token(client, monkeypatch):
+    import web_server
+
+    monkeypatch.setattr(web_server, "_CACHE_CLEAR_TOKEN", "secret")
+    assert client.get("/debug/timing").status_code == 403
+    assert client.get("/debug/timing", headers={"X-Cache-Token": "wrong"}).status_code == 403
+    assert client.get("/debug/timing", headers={"X-Cache-Token": "secret"}).status_code == 200
@@ -1,20 +1,83 @@
-import json
 import os
 import sqlite3
-from datetime import datetime, time
-from typing import Dict, List, Optional
+import atexit
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
 
+import orjson
+
+import db_driver
+
+# process_order rewrites drinks.json after this many orders rather than on
+# every call; anything still pending is written at exit
+_DRINKS_FLUSH_EVERY = 50
+
+# [start, end) hours of each named shift as two-digit strings, so they
+# compare directly against the hour in an order's timestamp
+_SHIFT_HOURS = {
+    'morning': ('08', '16'),
+    'evening': ('16', '24'),
+}
+
+# Revenue for one day, optionally one shift of it: a range over the indexed
+# 'YYYY-MM-DD HH:MM:SS' timestamps
+_SQL_REVENUE_RANGE = """
+    SELECT COUNT(*), COALESCE(SUM(total), 0)
+    FROM orders
+    WHERE timestamp >= ? AND timestamp < ?
+"""
+# Revenue for one shift across every day
+_SQL_REVENUE_HOURS = """
+    SELECT COUNT(*), COALESCE(SUM(total), 0)
+    FROM orders
+    WHERE substr(timestamp, 12, 2) >= ? AND substr(timestamp, 12, 2) < ?
+"""
+
+# (mtime_ns, raw bytes) for the drinks.json contents last read or written
+_drinks_cache: Optional[Tuple[int, bytes]] = None
+
+def _load_drinks() -> List[Dict]:
+    """Return a freshly parsed drinks.json, re-reading the file only when it changed.
+
+    Every caller gets its own list: BevTools edits drinks_data in place and
+    tracks its own unsaved changes, so instances must not share one.
+    """
+    global _drinks_cache
+    mtime = os.stat('drinks.json').st_mtime_ns
+    if _drinks_cache is None or _drinks_cache[0] != mtime:
+        with open('drinks.json', 'rb') as f:
+            _drinks_cache = (mtime, f.read())
+    return orjson.loads(_drinks_cache[1])
+
+# Tax rates in basis points (700 = 7%), so tax is worked out on integer cents
+_TAX_RATES_BP = {
+    'pour/shot': 700,
+    'glass': 700,
+    'bottle': 900,
+    'event': 1000
+}
+_DEFAULT_TAX_RATE_BP = 700
+
+def _to_cents(amount) -> int:
+    """Convert a dollar amount (float, int or Decimal) to integer cents"""
+    # Exact for anything priced to the cent; float error is far below half a cent
+    return round(float(amount) * 100)
+
+def _to_dollars(cents: int) -> Decimal:
+    """Convert integer cents back to an exact two-place Decimal"""
+    return Decimal(cents).scaleb(-2)
+
 class TransactionTools:
+    def calculate_tax_cents(self, amount_cents: int, tax_category: str) -> int:
+        """Calculate tax in cents for an amount in cents, rounding half up"""
+        rate_bp = _TAX_RATES_BP.get(tax_category, _DEFAULT_TAX_RATE_BP)
+        return (amount_cents * rate_bp + 5000) // 10000
+
     def calculate_tax(self, amount: Decimal, tax_category: str) -> Decimal:
         """Calculate tax for a given amount and category"""
-        tax_rates = {
-            'pour/shot': Decimal('0.07'),
-            'glass': Decimal('0.07'),
-            'bottle': Decimal('0.09'),
-            'event': Decimal('0.10')
-        }
-        return amount * tax_rates.get(tax_category, Decimal('0.07'))
+        return _to_dollars(self.calculate_tax_cents(_to_cents(amount), tax_category))
 
     def format_currency(self, amount: Decimal) -> str:
         """Format amount as currency"""
@@ -87,18 +150,33 @@ class BevTools:
         self.order_history: List[Dict] = []
         self.inventory: Dict[str, int] = {}
         self.menu: Dict[str, Dict] = {}
+        # Lowercased menu names for search_drinks, kept in step with menu
+        self._menu_lower: Dict[str, str] = {}
         self.active_orders: Dict[str, Dict] = {}
         
-        # Initialize database if it doesn't exist
+        # Initialize database if it doesn't exist; the connection stays open
+        # for the lifetime of the tools object
         self.db_file = "orders.db"
+        self._conn = self._connect()
+        # Refresh planner statistics and close the connection on exit
+        atexit.register(db_driver.close, self._conn)
+        self._lock = threading.Lock()
         self.initialize_db()
         
         # Load drinks data from JSON
-        with open('drinks.json', 'r') as f:
-            self.drinks_data = json.load(f)
+        self.drinks_data = _load_drinks()
+        self._index_drinks()
+        # Orders that changed drinks_data since it was last written to disk
+        self._drinks_dirty = 0
+        atexit.register(self.flush_drinks)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Same WAL and cache pragmas as the main database. The connection may
+        # be used from worker threads; _lock serializes its writers
+        return db_driver.connect(self.db_file, check_same_thread=False)
 
     def initialize_db(self):
-        conn = sqlite3.connect(self.db_file)
+        conn = self._conn
         cursor = conn.cursor()
         
         # Create orders table if it doesn't exist
@@ -112,8 +190,54 @@ class BevTools:
         )
         ''')
         
+        # One row per ordered drink; orders.items is left only for orders
+        # saved before this table existed
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_items (
+            order_id INTEGER NOT NULL,
+            drink_name TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES orders(id)
+        )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_oi_order ON order_items(order_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_ts ON orders(timestamp)")
+        
         conn.commit()
-        conn.close()
+
+    def _index_drinks(self):
+        """Build the lookup structures over drinks_data used by orders and search"""
+        # First entry wins for a repeated name, as the old linear scan did
+        self._drink_by_name: Dict[str, Dict] = {}
+        # Complete entries with their lowercased search fields
+        self._drink_search: List[tuple] = []
+        for drink in self.drinks_data:
+            name = drink.get("name")
+            if name:
+                self._drink_by_name.setdefault(name, drink)
+            if name and drink.get("category"):
+                self._drink_search.append((
+                    drink,
+                    name.lower(),
+                    drink["category"].lower(),
+                    drink.get("subcategory", "").lower()
+                ))
+
+    def flush_drinks(self):
+        """Write drinks_data back to drinks.json if orders have changed it"""
+        if not self._drinks_dirty:
+            return
+        global _drinks_cache
+        # Write a sibling file and swap it in, so a crash mid-write can't
+        # leave a truncated drinks.json behind
+        data = orjson.dumps(self.drinks_data, option=orjson.OPT_INDENT_2)
+        with open('drinks.json.tmp', 'wb') as f:
+            f.write(data)
+        os.replace('drinks.json.tmp', 'drinks.json')
+        # What was just written is already in memory; don't read it back
+        _drinks_cache = (os.stat('drinks.json').st_mtime_ns, data)
+        self._drinks_dirty = 0
 
     # Create operations
     def create_drink(self, name: str, category: str, subcategory: str, price: float, description: str = "") -> bool:
@@ -126,6 +250,7 @@ class BevTools:
             "description": description,
             "created_at": datetime.now().isoformat()
         }
+        self._menu_lower[name] = name.lower()
         self.inventory[name] = 0
         return True
 
@@ -151,8 +276,9 @@ class BevTools:
                 if details["category"] == category}
 
     def search_drinks(self, query: str) -> List[str]:
-        return [name for name in self.menu.keys() 
-                if query.lower() in name.lower()]
+        query = query.lower()
+        return [name for name, name_lower in self._menu_lower.items() 
+                if query in name_lower]
 
     # Update operations
     def update_drink(self, name: str, **updates) -> bool:
@@ -188,6 +314,7 @@ class BevTools:
         if name not in self.menu:
             return False
         del self.menu[name]
+        del self._menu_lower[name]
         del self.inventory[name]
         return True
 
@@ -232,25 +359,26 @@ class BevTools:
         if not self.transaction_tools.validate_payment_method(payment_method):
             return None
 
-        total_amount = Decimal('0')
-        total_tax = Decimal('0')
+        # Work in integer cents; amounts only become Decimal in the result
+        total_amount = 0
+        total_tax = 0
         processed_items = []
 
         for item in items:
             if item['id'] not in self.menu:
                 continue
                 
-            price = Decimal(str(self.menu[item['id']]['price']))
+            price = _to_cents(self.menu[item['id']]['price'])
             quantity = item['quantity']
             line_total = price * quantity
-            tax = self.transaction_tools.calculate_tax(line_total, item.get('tax_category', 'pour/shot'))
+            tax = self.transaction_tools.calculate_tax_cents(line_total, item.get('tax_category', 'pour/shot'))
             
             processed_items.append({
                 'id': item['id'],
                 'quantity': quantity,
-                'unit_price': price,
-                'line_total': line_total,
-                'tax': tax
+                'unit_price': _to_dollars(price),
+                'line_total': _to_dollars(line_total),
+                'tax': _to_dollars(tax)
             })
             
             total_amount += line_total
@@ -258,8 +386,8 @@ class BevTools:
 
         return {
             'items': processed_items,
-            'total_amount': total_amount,
-            'total_tax': total_tax,
+            'total_amount': _to_dollars(total_amount),
+            'total_tax': _to_dollars(total_tax),
             'payment_method': payment_method,
             'timestamp': datetime.now().isoformat()
         }
@@ -291,122 +419,135 @@ class BevTools:
     def generate_revenue_report(self, 
                               date: Optional[str] = None,
                               shift: Optional[str] = None) -> Optional[Dict]:
-        """Generate revenue report for date/shift"""
-        transactions = [t for t in self.order_history 
-                       if self._matches_date_shift(t, date, shift)]
+        """Generate revenue report for date/shift from the saved orders"""
+        # Unknown shifts don't filter, as before; a whole day is hours 00-24
+        start, end = _SHIFT_HOURS.get(shift, ('00', '24'))
         
-        if not transactions:
+        # SQLite does the aggregation; a date becomes an index range
+        with self._lock:
+            cursor = self._conn.cursor()
+            if date:
+                cursor.execute(_SQL_REVENUE_RANGE, (f"{date} {start}", f"{date} {end}"))
+            else:
+                cursor.execute(_SQL_REVENUE_HOURS, (start, end))
+            transaction_count, total_sales = cursor.fetchone()
+        
+        if not transaction_count:
             return None
-            
-        return self.revenue_tools.calculate_shift_revenue(transactions)
-
-    def _matches_date_shift(self, 
-                          transaction: Dict,
-                          date: Optional[str],
-                          shift: Optional[str]) -> bool:
-        """Check if transaction matches date/shift criteria"""
-        if date and date not in transaction['timestamp']:
-            return False
         
-        if shift:
-            trans_time = datetime.fromisoformat(transaction['timestamp']).time()
-            if shift == 'morning' and not (8 <= trans_time.hour < 16):
-                return False
-            if shift == 'evening' and not (16 <= trans_time.hour < 24):
-                return False
-                
-        return True
+        return {
+            'total_sales': total_sales,
+            'total_tax': 0,  # orders are saved with their totals only
+            'transaction_count': transaction_count,
+            'average_transaction': total_sales / transaction_count
+        }
 
     def process_order(self, items, payment_method="cash"):
         """Process a drink order and save it to the database"""
         try:
-            # Calculate total
-            total = 0
-            processed_items = []
+            return self.process_orders_batch([
+                {"items": items, "payment_method": payment_method}
+            ])[0]
             
-            for item in items:
-                drink_name = item.get("name")
-                quantity = item.get("quantity", 1)
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def process_orders_batch(self, orders: List[Dict]) -> List[Dict]:
+        """Process several orders ({"items", "payment_method"}) in one transaction.
+
+        Returns one result dict per order, in order. Raises if the orders
+        can't be saved, in which case none of them are.
+        """
+        # Held for the whole batch: drinks_data and the connection are both
+        # shared with other threads
+        with self._lock:
+            rows = []
+            results = []
+            # (drink, quantity) stock changes, applied only once the orders
+            # are committed so a failed save leaves drinks_data untouched
+            sold = []
+            for order in orders:
+                items = order["items"]
+                payment_method = order.get("payment_method", "cash")
                 
-                # Find the drink in our data
-                drink = next((d for d in self.drinks_data if d.get("name") == drink_name), None)
+                # Calculate total
+                total = 0
+                processed_items = []
                 
-                if drink:
-                    price = drink.get("price", 0) * quantity
-                    total += price
-                    
-                    # Update inventory and sales
-                    current_inventory = drink.get("inventory", 0)
-                    current_sales = drink.get("sales", 0)
+                for item in items:
+                    drink_name = item.get("name")
+                    quantity = item.get("quantity", 1)
                     
-                    drink["inventory"] = current_inventory - quantity
-                    drink["sales"] = current_sales + quantity
+                    # Find the drink in our data
+                    drink = self._drink_by_name.get(drink_name)
                     
-                    processed_items.append({
-                        "name": drink_name,
-                        "quantity": quantity,
-                        "price": price
-                    })
-            
-            # Save updated inventory back to JSON
-            with open('drinks.json', 'w') as f:
-                json.dump(self.drinks_data, f, indent=2)
-            
-            # Save order to database
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
+                    if drink:
+                        price = drink.get("price", 0) * quantity
+                        total += price
+                        sold.append((drink, quantity))
+                        
+                        processed_items.append({
+                            "name": drink_name,
+                            "quantity": quantity,
+                            "price": price
+                        })
+                
+                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                rows.append((timestamp, total, payment_method))
+                results.append({
+                    "order_id": None,  # Filled in once the row is inserted
+                    "items": processed_items,
+                    "total": total,
+                    "payment_method": payment_method,
+                    "timestamp": timestamp
+                })
             
-            # Convert datetime to string if needed
-            current_time = datetime.now()
-            if isinstance(current_time, datetime) or isinstance(current_time, time):
-                timestamp = current_time.strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                timestamp = str(current_time)
+            # Save every order with a single commit. Orders go in one at a time
+            # so each result can report its own order_id
+            with self._conn:
+                cursor = self._conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                item_rows = []
+                for row, result in zip(rows, results):
+                    cursor.execute(
+                        "INSERT INTO orders (timestamp, total, payment_method) VALUES (?, ?, ?)",
+                        row
+                    )
+                    order_id = result["order_id"] = cursor.lastrowid
+                    item_rows.extend(
+                        (order_id, item["name"], item["quantity"], item["price"])
+                        for item in result["items"]
+                    )
+                cursor.executemany(
+                    "INSERT INTO order_items (order_id, drink_name, quantity, price) VALUES (?, ?, ?, ?)",
+                    item_rows
+                )
             
-            cursor.execute(
-                "INSERT INTO orders (timestamp, items, total, payment_method) VALUES (?, ?, ?, ?)",
-                (timestamp, json.dumps(processed_items), total, payment_method)
-            )
+            # Update inventory and sales
+            for drink, quantity in sold:
+                drink["inventory"] = drink.get("inventory", 0) - quantity
+                drink["sales"] = drink.get("sales", 0) + quantity
             
-            order_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            # Save updated inventory back to JSON once enough orders have built up
+            # Orders that matched no drink left drinks_data untouched
+            self._drinks_dirty += sum(1 for result in results if result["items"])
+            if self._drinks_dirty >= _DRINKS_FLUSH_EVERY:
+                self.flush_drinks()
             
-            return {
-                "order_id": order_id,
-                "items": processed_items,
-                "total": total,
-                "payment_method": payment_method,
-                "timestamp": timestamp
-            }
-            
-        except Exception as e:
-            return {"error": str(e)}
+            return results
     
     def lookup_beverage(self, name=None, category=None, subcategory=None, max_price=None):
         """Search for beverages based on criteria"""
-        results = []
-        
-        for drink in self.drinks_data:
-            # Skip incomplete entries
-            if not drink.get("name") or not drink.get("category"):
-                continue
-                
-            match = True
-            
-            if name and name.lower() not in drink.get("name", "").lower():
-                match = False
-                
-            if category and category.lower() != drink.get("category", "").lower():
-                match = False
-                
-            if subcategory and subcategory.lower() != drink.get("subcategory", "").lower():
-                match = False
-                
-            if max_price and drink.get("price", 0) > float(max_price):
-                match = False
-                
-            if match:
-                results.append(drink)
+        # Lowercase the criteria once rather than per drink
+        name = name.lower() if name else None
+        category = category.lower() if category else None
+        subcategory = subcategory.lower() if subcategory else None
+        max_price = float(max_price) if max_price else None
         
-        return results
+        return [
+            drink for drink, drink_name, drink_category, drink_subcategory in self._drink_search
+            if (not name or name in drink_name)
+            and (not category or category == drink_category)
+            and (not subcategory or subcategory == drink_subcategory)
+            and (max_price is None or drink.get("price", 0) <= max_price)
+        ]
\ No newline at end of file
@@ -1,59 +1,85 @@
+import matplotlib
+# Non-interactive renderer; must be selected before pyplot is imported
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import io
+import threading
+import time
 import base64
-from typing import List, Dict, Any, Optional
-import numpy as np
+from typing import List, Dict, Any, Optional, Tuple, Union
 from db_driver import DatabaseDriver
 import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
+from plotly.colors import get_colorscale
+
+# Categories shown on the full menu, in display order
+MENU_CATEGORIES = ["Signature", "Classics", "Beer", "Wine", "Spirits", "Non-Alcoholic"]
+
+def _png_result(image_png: bytes, data_uri: bool) -> Union[Tuple[bytes, str], str]:
+    """Hand back the raw PNG for the HTTP layer, base64-encoding only on request"""
+    if not data_uri:
+        return image_png, "image/png"
+    encoded_image = base64.b64encode(image_png).decode('ascii')
+    return f"data:image/png;base64,{encoded_image}"
 
 class Visualizer:
     def __init__(self, db: DatabaseDriver):
         self.db = db
+        # One figure per chart type, created on first use and redrawn for
+        # every later chart instead of building a new one each time
+        self._pie_fig = None
+        self._bar_fig = None
+        # The shared figures can only be drawn by one caller at a time
+        self._render_lock = threading.Lock()
     
-    def generate_pie_chart(self, data: Dict[str, float], title: str = "Category Distribution") -> str:
-        """Generate a pie chart from provided data and return as base64 encoded string"""
-        plt.figure(figsize=(10, 6))
-        plt.pie(data.values(), labels=data.keys(), autopct='%1.1f%%', startangle=90)
-        plt.axis('equal')
-        plt.title(title)
-        
-        # Save plot to a bytes buffer
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png')
-        buffer.seek(0)
-        image_png = buffer.getvalue()
-        buffer.close()
-        plt.close()
+    def _figure(self, attr: str, figsize: tuple):
+        """Return the cached figure and axes stored under attr, cleared for a new chart"""
+        fig = getattr(self, attr)
+        if fig is None:
+            fig, _ = plt.subplots(figsize=figsize)
+            # Kept for reuse, so pyplot's figure-manager bookkeeping isn't needed
+            plt.close(fig)
+            setattr(self, attr, fig)
+        ax = fig.axes[0]
+        ax.clear()
+        return fig, ax
+    
+    def generate_pie_chart(self, data: Dict[str, float], title: str = "Category Distribution",
+                           data_uri: bool = False) -> Union[Tuple[bytes, str], str]:
+        """Generate a pie chart and return (png_bytes, mime_type), or a base64 data URI if data_uri"""
+        with self._render_lock:
+            fig, ax = self._figure('_pie_fig', (10, 6))
+            ax.pie(data.values(), labels=data.keys(), autopct='%1.1f%%', startangle=90)
+            ax.axis('equal')
+            ax.set_title(title)
+            
+            # Save plot to a bytes buffer
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png')
+            image_png = buffer.getvalue()
         
-        # Encode the bytes as base64
-        encoded_image = base64.b64encode(image_png).decode('utf-8')
-        return f"data:image/png;base64,{encoded_image}"
+        return _png_result(image_png, data_uri)
     
     def generate_bar_chart(self, categories: List[str], values: List[float], 
                            title: str = "Sales by Category", x_label: str = "Categories", 
-                           y_label: str = "Sales") -> str:
-        """Generate a bar chart and return as base64 encoded string"""
-        plt.figure(figsize=(12, 6))
-        plt.bar(categories, values)
-        plt.title(title)
-        plt.xlabel(x_label)
-        plt.ylabel(y_label)
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
+                           y_label: str = "Sales", data_uri: bool = False) -> Union[Tuple[bytes, str], str]:
+        """Generate a bar chart and return (png_bytes, mime_type), or a base64 data URI if data_uri"""
+        with self._render_lock:
+            fig, ax = self._figure('_bar_fig', (12, 6))
+            ax.bar(categories, values)
+            ax.set_title(title)
+            ax.set_xlabel(x_label)
+            ax.set_ylabel(y_label)
+            ax.tick_params(axis='x', labelrotation=45)
+            for label in ax.get_xticklabels():
+                label.set_horizontalalignment('right')
+            fig.tight_layout()
+            
+            # Save plot to a bytes buffer
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png')
+            image_png = buffer.getvalue()
         
-        # Save plot to a bytes buffer
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png')
-        buffer.seek(0)
-        image_png = buffer.getvalue()
-        buffer.close()
-        plt.close()
-        
-        # Encode the bytes as base64
-        encoded_image = base64.b64encode(image_png).decode('utf-8')
-        return f"data:image/png;base64,{encoded_image}"
+        return _png_result(image_png, data_uri)
     
     def generate_visual_menu(self, category: Optional[str] = None) -> Dict[str, Any]:
         """Generate an interactive menu visualization"""
@@ -61,28 +87,76 @@ class Visualizer:
         if category:
             bevs = self.db.get_bevs_by_category(category)
         else:
-            # Get all categories and combine
-            bevs = []
-            for cat in ["Signature", "Classics", "Beer", "Wine", "Spirits", "Non-Alcoholic"]:
-                bevs.extend(self.db.get_bevs_by_category(cat))
+            # Get all categories in one query
+            bevs = self.db.get_bevs_by_categories(MENU_CATEGORIES)
+        return self.menu_figure(bevs)
+
+    def generate_sales_trend(self, days: int = 30) -> Dict[str, Any]:
+        """Generate sales trend visualization"""
+        return self.sales_figure(self.db.get_sales_trend(days), days)
 
-        # Convert to DataFrame
-        df = pd.DataFrame([{
-            'name': bev.name,
-            'category': bev.category,
-            'subcategory': bev.subcategory,
-            'price': bev.price/100,  # Convert cents to dollars
-            'inventory': bev.inventory
-        } for bev in bevs])
+    def generate_all(self, days: int = 30, timings: Optional[Dict[str, float]] = None) -> Tuple[str, str]:
+        """Generate the full menu and the sales trend from a single database read.
+
+        If timings is given, the milliseconds each stage took are stored in it.
+        """
+        start = time.perf_counter()
+        bevs, trend_data = self.db.get_menu_and_sales_trend(MENU_CATEGORIES, days)
+        read = time.perf_counter()
+        menu_json = self.menu_figure(bevs)
+        built_menu = time.perf_counter()
+        sales_json = self.sales_figure(trend_data, days)
+        if timings is not None:
+            done = time.perf_counter()
+            timings['db_read_ms'] = round((read - start) * 1000, 3)
+            timings['menu_figure_ms'] = round((built_menu - read) * 1000, 3)
+            timings['sales_figure_ms'] = round((done - built_menu) * 1000, 3)
+        return menu_json, sales_json
+
+    def menu_figure(self, bevs: List) -> str:
+        """Build the menu treemap from already fetched beverages"""
+        # Build the Menu > category > subcategory > name hierarchy directly.
+        # Each node id is its path; a parent's value is the sum of its leaves
+        # and its colour their price average weighted by value, as
+        # px.treemap computes them
+        nodes = {"Menu": ["Menu", "", 0.0, 0.0, 0]}  # id: [label, parent, value, value*price, inventory]
+        for bev in bevs:
+            price = bev.price/100  # Convert cents to dollars
+            parent = "Menu"
+            for label in (bev.category, bev.subcategory, bev.name):
+                node_id = f"{parent}/{label}"
+                node = nodes.get(node_id)
+                if node is None:
+                    node = nodes[node_id] = [label, parent, 0.0, 0.0, 0]
+                parent = node_id
+            # Walk back up from the leaf, adding it to every node on the way
+            node_id = parent
+            while node_id:
+                node = nodes[node_id]
+                node[2] += price
+                node[3] += price * price
+                node[4] += bev.inventory
+                node_id = node[1]
+        
+        ids = list(nodes)
+        labels, parents, values, weighted, inventory = zip(*nodes.values())
+        colors = [w / v if v else 0 for w, v in zip(weighted, values)]
 
         # Create treemap
-        fig = px.treemap(df, 
-            path=[px.Constant("Menu"), 'category', 'subcategory', 'name'],
-            values='price',
-            color='price',
-            hover_data=['inventory'],
-            color_continuous_scale='RdBu'
-        )
+        fig = go.Figure(go.Treemap(
+            ids=ids,
+            labels=labels,
+            parents=parents,
+            values=values,
+            branchvalues="total",
+            customdata=[[i] for i in inventory],
+            marker=dict(
+                colors=colors,
+                colorscale=get_colorscale('RdBu'),
+                colorbar=dict(title="price")
+            ),
+            hovertemplate="%{label}<br>price=%{value}<br>inventory=%{customdata[0]}<extra></extra>"
+        ))
 
         fig.update_layout(
             title="Interactive Menu Visualization",
@@ -92,19 +166,17 @@ class Visualizer:
 
         return fig.to_json()
 
-    def generate_sales_trend(self, days: int = 30) -> Dict[str, Any]:
-        """Generate sales trend visualization"""
-        trend_data = self.db.get_sales_trend(days)
-        
-        df = pd.DataFrame(trend_data)
-        df['date'] = pd.to_datetime(df['date'])
+    def sales_figure(self, trend_data: List[Dict[str, Any]], days: int) -> str:
+        """Build the sales trend chart from already fetched daily totals"""
+        # Rows already come back in date order; Plotly reads the ISO date
+        # strings as a date axis without converting them first
         
         # Create line chart
         fig = go.Figure()
         
         fig.add_trace(go.Scatter(
-            x=df['date'],
-            y=df['sales_total'],
+            x=[row['date'] for row in trend_data],
+            y=[row['sales_total'] for row in trend_data],
             name='Sales',
             line=dict(color='blue')
         ))
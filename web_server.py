@@ -1,19 +1,42 @@
-from flask import Flask, render_template_string
+from flask import Flask, make_response, request, send_from_directory
 from db_driver import DatabaseDriver
 from visualization import Visualizer
-import json
+from plotly.offline import get_plotlyjs_version
+from typing import Dict, Optional, Tuple
+import gzip
+import hashlib
+import hmac
+import os
+import threading
+import time
 
 app = Flask(__name__)
 db = DatabaseDriver()
 viz = Visualizer(db)
 
+# The plotly.js release the installed plotly package writes figures for.
+# Pinned rather than plotly-latest, which is frozen at 1.x and can't draw
+# them; the full bundle is needed since the partial ones lack treemaps
+_PLOTLY_JS_URL = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+# Sent with the page so the browser starts fetching plotly.js before it has
+# parsed the <head>; proxies with HTTP/2 can turn it into 103 Early Hints
+_PLOTLY_PRELOAD = f"<{_PLOTLY_JS_URL}>; rel=preload; as=script"
+
+# Named by content and served by render_js as immutable, so browsers keep
+# it until render.js is edited and the name changes
+with open(os.path.join(app.static_folder, 'render.js'), 'rb') as f:
+    _RENDER_JS_DIGEST = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+_RENDER_JS_URL = f"/render.{_RENDER_JS_DIGEST}.js"
+
 # HTML template with plotly
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
     <title>Beverage Visualizations</title>
-    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+    <link rel="preload" href="{{ data_url }}" as="fetch" crossorigin>
+    <script defer src="{{ plotly_js_url }}"></script>
+    <script defer src="{{ render_js_url }}" data-url="{{ data_url }}"></script>
     <style>
         .chart-container { margin: 20px; padding: 20px; border: 1px solid #ddd; }
     </style>
@@ -27,28 +50,220 @@ HTML_TEMPLATE = """
         <h2>Sales Trend</h2>
         <div id="sales-chart"></div>
     </div>
-
-    <script>
-        // Parse and render menu chart
-        const menuData = JSON.parse({{menu_data|tojson}});
-        Plotly.newPlot('menu-chart', menuData.data, menuData.layout);
-
-        // Parse and render sales chart
-        const salesData = JSON.parse({{sales_data|tojson}});
-        Plotly.newPlot('sales-chart', salesData.data, salesData.layout);
-    </script>
 </body>
 </html>
 """
 
+# The page is fixed text around the data URL, so it is split once at import
+# and the URL is spliced between the pieces, with no template engine on the
+# render path
+_HTML_PARTS = (
+    HTML_TEMPLATE
+    .replace("{{ plotly_js_url }}", _PLOTLY_JS_URL)
+    .replace("{{ render_js_url }}", _RENDER_JS_URL)
+    .encode()
+    .split(b"{{ data_url }}")
+)
+
+# Seconds between background rebuilds of the page
+_PAGE_REFRESH = 30
+# Seconds a generated figure is reused before querying the database again
+_FIGURE_TTL = 30
+
+# (expires_at, (menu_json, sales_json)) for the figures _cached_figures built
+_figure_cache: Optional[Tuple[float, Tuple[str, str]]] = None
+
+# Shared secret /cache/clear and /debug/timing must be sent in
+# X-Cache-Token; both are refused while it isn't set
+_CACHE_CLEAR_TOKEN = os.environ.get('CACHE_CLEAR_TOKEN')
+
+# (digest, body, gzipped_body) for the page and for the chart data it
+# fetches, as last built by _build_page
+_page_cache: Optional[Tuple[str, bytes, bytes]] = None
+_data_cache: Optional[Tuple[str, bytes, bytes]] = None
+
+# Milliseconds per stage of the last page build, served by /debug/timing
+_last_timings: Dict[str, float] = {}
+
+def _cached_figures(timings: Optional[Dict[str, float]] = None) -> Tuple[str, str]:
+    """Return the menu and sales figures, regenerating both once they expire.
+
+    A regeneration records its stage timings in timings, if given.
+    """
+    global _figure_cache
+    now = time.monotonic()
+    entry = _figure_cache
+    if entry is None or entry[0] <= now:
+        # One database read feeds both charts
+        entry = _figure_cache = (now + _FIGURE_TTL, viz.generate_all(timings=timings))
+    return entry[1]
+
+def _resource(body: bytes) -> Tuple[str, bytes, bytes]:
+    """Pair body with its content hash and a gzip copy"""
+    # Hashing the content means an unchanged rebuild keeps the same ETag.
+    # Compressing here, once per build, spares every response; the figure
+    # JSON shrinks several times over
+    return (hashlib.blake2b(body, digest_size=16).hexdigest(), body,
+            gzip.compress(body, mtime=0))
+
+def _render_data(timings: Optional[Dict[str, float]] = None) -> bytes:
+    menu_json, sales_json = _cached_figures(timings)
+    # The figures arrive as Plotly JSON text, so they are spliced into the
+    # payload as is rather than parsed and encoded again
+    return b"".join((b'{"menu":', menu_json.encode(),
+                     b',"sales":', sales_json.encode(), b'}'))
+
+def _write_static(name: str, data: bytes):
+    """Atomically replace static/<name> with data"""
+    path = os.path.join(app.static_folder, name)
+    # Unique per process and thread: every worker runs its own refresh loop,
+    # and a request can rebuild the page while that loop is writing
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _build_page() -> Tuple[Tuple[str, bytes, bytes], Tuple[str, bytes, bytes]]:
+    """Render the chart data and the page, publish them for index and
+    chart_data to serve, and return them as (page, data)"""
+    global _page_cache, _data_cache, _last_timings
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    body = _render_data(timings)
+    rendered = time.perf_counter()
+    data = _resource(body)
+    # The data URL carries its content hash, so it can be cached forever
+    # and only the small page has to be revalidated
+    page = _resource(f"/data.{data[0]}.json".encode().join(_HTML_PARTS))
+    done = time.perf_counter()
+    # The figure stages are only present when the figures were rebuilt
+    timings['figures_cached'] = 'db_read_ms' not in timings
+    timings['render_data_ms'] = round((rendered - start) * 1000, 3)
+    timings['hash_gzip_ms'] = round((done - rendered) * 1000, 3)
+    timings['total_ms'] = round((done - start) * 1000, 3)
+    _last_timings = timings
+    app.logger.debug("Page build timings: %s", timings)
+    # Rebinding a global is atomic, so readers see the old version or the
+    # new one and never need a lock. The data goes first, so a page is never
+    # served before the data it names.
+    _data_cache = data
+    previous, _page_cache = _page_cache, page
+    # Mirror the page into static/ so a front-end server like nginx can send
+    # it (or the .gz copy, with gzip_static) without reaching Flask at all
+    if previous is None or previous[0] != page[0]:
+        os.makedirs(app.static_folder, exist_ok=True)
+        _write_static('index.html.gz', page[2])
+        _write_static('index.html', page[1])
+    return page, data
+
+def _refresh_loop():
+    while True:
+        try:
+            _build_page()
+        except Exception:
+            # Keep serving the last good page and try again next round
+            app.logger.exception("Failed to rebuild the index page")
+        time.sleep(_PAGE_REFRESH)
+
+# Rebuilds happen here rather than on the request path, so index only
+# ever copies out prebuilt bytes
+threading.Thread(target=_refresh_loop, name="page-refresh", daemon=True).start()
+
+def _has_admin_token() -> bool:
+    """Whether the request carries the CACHE_CLEAR_TOKEN secret"""
+    # Compared as bytes: compare_digest rejects non-ASCII str
+    token = request.headers.get('X-Cache-Token', '').encode()
+    return bool(_CACHE_CLEAR_TOKEN) and hmac.compare_digest(token, _CACHE_CLEAR_TOKEN.encode())
+
+def _send(resource: Tuple[str, bytes, bytes], mimetype: str, cache_control: str):
+    """Respond with a built resource, gzipped when the client accepts it"""
+    if 'gzip' in request.accept_encodings:
+        response = make_response(resource[2])
+        response.headers['Content-Encoding'] = 'gzip'
+        # Each encoding is its own representation with its own ETag
+        response.set_etag(resource[0] + "-gzip")
+    else:
+        response = make_response(resource[1])
+        response.set_etag(resource[0])
+    response.mimetype = mimetype
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
 @app.route('/')
 def index():
-    menu_data = viz.generate_visual_menu()
-    sales_data = viz.generate_sales_trend()
+    page = _page_cache
+    if page is None:
+        # First hit, or the cache was just cleared
+        page, _ = _build_page()
     
-    return render_template_string(HTML_TEMPLATE, 
-                                menu_data=menu_data,
-                                sales_data=sales_data)
+    # Let browsers keep the page but revalidate it, getting a bodiless 304
+    # while the ETag still matches
+    response = _send(page, 'text/html', 'no-cache')
+    response.headers['Link'] = _PLOTLY_PRELOAD
+    return response.make_conditional(request)
+
+@app.route('/data.<digest>.json')
+def chart_data(digest: str):
+    data = _data_cache
+    if data is None:
+        # Use what was built rather than re-reading the global, which a
+        # concurrent /cache/clear may have reset
+        _, data = _build_page()
+    if digest == data[0]:
+        # The URL names this exact content, so it never needs rechecking
+        response = _send(data, 'application/json', 'public, max-age=31536000, immutable')
+    else:
+        # A page from before the last rebuild, or from another worker; send
+        # the current data but don't let it be cached under the old name
+        response = _send(data, 'application/json', 'no-cache')
+    return response.make_conditional(request)
+
+@app.route('/render.<digest>.js')
+def render_js(digest: str):
+    if digest == _RENDER_JS_DIGEST:
+        response = send_from_directory(app.static_folder, 'render.js', max_age=31536000)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        # A page naming an older script; send the current one uncached
+        response = send_from_directory(app.static_folder, 'render.js', max_age=0)
+        response.cache_control.no_cache = True
+    return response
+
+@app.route('/debug/timing')
+def debug_timing():
+    """Report the stage timings of the last page build; triggers no work.
+
+    Requires the CACHE_CLEAR_TOKEN secret, like /cache/clear.
+    """
+    if not _has_admin_token():
+        return '', 403
+    return _last_timings
+
+@app.route('/cache/clear', methods=['POST'])
+def clear_cache():
+    """Drop the cached figures and page so the next hit reflects new writes.
+
+    Only the worker process that receives the POST is cleared; other
+    gunicorn workers catch up at their next refresh, within _PAGE_REFRESH
+    seconds. Requires the CACHE_CLEAR_TOKEN secret, since every clear costs
+    a database read and a figure rebuild.
+    """
+    if not _has_admin_token():
+        return '', 403
+    global _figure_cache, _page_cache, _data_cache
+    _figure_cache = None
+    _page_cache = None
+    _data_cache = None
+    return '', 204
+
+if os.environ.get('FLASK_PROFILE'):
+    from werkzeug.middleware.profiler import ProfilerMiddleware
+    # Print the 30 costliest calls of every request to stderr
+    app.wsgi_app = ProfilerMiddleware(app.wsgi_app, restrictions=[30])
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    # The reloader and debugger are for local work only; production runs
+    # through a WSGI server, see wsgi.py
+    app.run(debug=bool(os.environ.get('FLASK_DEV')), port=5000)
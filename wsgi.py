@@ -0,0 +1,7 @@
+"""WSGI entry point for production servers, e.g.
+
+    gunicorn wsgi:app
+
+which picks up the worker settings in gunicorn.conf.py.
+"""
+from web_server import app
\ No newline at end of file